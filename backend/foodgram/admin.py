@@ -1,7 +1,7 @@
 from django.contrib import admin
 
 from .models import (Favorite, Follow, Ingredient, Recipe,
-                     RecipeIngredient, ShoppingCart, Tag)
+                     RecipeIngredient, ShoppingCart, ShoppingListItem, Tag)
 
 
 @admin.register(Favorite)
@@ -20,6 +20,16 @@ class ShoppingCartAdmin(admin.ModelAdmin):
                     )
 
 
+@admin.register(ShoppingListItem)
+class ShoppingListItemAdmin(admin.ModelAdmin):
+    list_display = ('id',
+                    'user',
+                    'ingredient',
+                    'amount'
+                    )
+    list_filter = ('user',)
+
+
 @admin.register(Follow)
 class FollowAdmin(admin.ModelAdmin):
     list_display = ('id',
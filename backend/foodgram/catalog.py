@@ -0,0 +1,98 @@
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+
+from . import metrics
+from .models import Ingredient, Tag
+from .versions import bump_catalog_version, get_catalog_version
+
+
+Snapshot = namedtuple('Snapshot', 'version objects by_id by_slug')
+
+
+class Catalog:
+    """Справочник в памяти процесса: объекты по id и по слагу.
+    Перечитывается целиком, когда меняется его версия в общем кеше,
+    так что все процессы видят изменения после post_save/post_delete.
+    Версия сверяется не чаще раза в CATALOG_VERSION_TTL секунд,
+    а не на каждый поиск объекта; свои изменения процесс видит сразу."""
+
+    def __init__(self, name, model, slug_field=None):
+        self.name = name
+        self.model = model
+        self.slug_field = slug_field
+        self.lock = threading.Lock()
+        self.snapshot = None
+        self.checked_until = 0
+
+    def __deepcopy__(self, memo):
+        "Поля сериализаторов и фильтров копируются, справочник общий."
+        return self
+
+    def load(self, version):
+        objects = list(self.model.objects.all())
+        by_id = {obj.pk: obj for obj in objects}
+        by_slug = {}
+        if self.slug_field is not None:
+            by_slug = {getattr(obj, self.slug_field): obj for obj in objects}
+        return Snapshot(version, objects, by_id, by_slug)
+
+    def expire(self):
+        "Сверить версию при следующем обращении."
+        self.checked_until = 0
+
+    def get_snapshot(self):
+        snapshot = self.snapshot
+        if snapshot is not None and time.monotonic() < self.checked_until:
+            return snapshot
+        version = get_catalog_version(self.name)[0]
+        metrics.cache_lookup(
+            'catalog', snapshot is not None and snapshot.version == version)
+        if snapshot is None or snapshot.version != version:
+            with self.lock:
+                snapshot = self.snapshot
+                if snapshot is None or snapshot.version != version:
+                    snapshot = self.snapshot = self.load(version)
+        self.checked_until = time.monotonic() + settings.CATALOG_VERSION_TTL
+        return snapshot
+
+    def all(self):
+        return self.get_snapshot().objects
+
+    def get(self, pk):
+        "Объект по id или None."
+        return self.get_snapshot().by_id.get(pk)
+
+    def get_by_slug(self, slug):
+        "Объект по слагу или None."
+        return self.get_snapshot().by_slug.get(slug)
+
+    def lookup(self, field, value):
+        """Объект по значению поля id или слагового поля.
+        Значение приводится к типу ключа так же, как при запросе к базе:
+        для неподходящего значения будет TypeError или ValueError."""
+        if field in ('id', 'pk'):
+            return self.get(int(value))
+        if field == self.slug_field:
+            return self.get_by_slug(str(value))
+        raise LookupError(f'{self.name}: нет индекса по полю {field}')
+
+
+tags = Catalog('tag', Tag, slug_field='slug')
+ingredients = Catalog('ingredient', Ingredient)
+
+CATALOGS = {catalog.name: catalog for catalog in (tags, ingredients)}
+
+
+def expire_catalogs():
+    "Сверить версии всех справочников, например после очистки кеша."
+    for catalog in CATALOGS.values():
+        catalog.expire()
+
+
+def catalog_changed(name):
+    "Новая версия справочника для всех процессов и сверка в этом."
+    bump_catalog_version(name)
+    CATALOGS[name].expire()
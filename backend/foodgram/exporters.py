@@ -0,0 +1,160 @@
+import csv
+import io
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import StreamingHttpResponse
+from pdfrw import PdfArray, PdfDict, PdfName, PdfWriter
+from rest_framework.negotiation import DefaultContentNegotiation
+from text_unidecode import unidecode
+
+from . import metrics
+from .models import ShoppingCart, ShoppingListItem
+from .versions import get_catalog_version
+
+SHOPPING_LIST_TITLE = 'Список покупок:'
+CHUNK_SIZE = 64 * 1024
+PDF_PAGE_SIZE = (595, 842)
+PDF_FONT_SIZE = 12
+PDF_LINES_PER_PAGE = 60
+
+
+class ShoppingListNegotiation(DefaultContentNegotiation):
+    "Параметр format выбирает формат файла, а не рендерер DRF."
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        renderer = renderers[0]
+        return renderer, renderer.media_type
+
+
+class Echo:
+    "Буфер для csv.writer, который сразу отдает записанную строку."
+
+    def write(self, value):
+        return value
+
+
+def get_shopping_list(user):
+    "Суммарное количество ингредиентов из списка покупок пользователя."
+    return ShoppingListItem.objects.filter(user=user).values_list(
+        'ingredient__name', 'ingredient__measurement_unit',
+        'amount').order_by('ingredient__name')
+
+
+def render_txt(shopping_list):
+    "Список покупок в виде текстового файла."
+    yield f'{SHOPPING_LIST_TITLE}\n'.encode('utf-8')
+    for name, measurement_unit, amount in shopping_list:
+        yield f'{name}, {measurement_unit} - {amount}\n'.encode('utf-8')
+
+
+def render_csv(shopping_list):
+    "Список покупок в виде CSV-файла."
+    writer = csv.writer(Echo())
+    yield '\ufeff'.encode('utf-8')
+    yield writer.writerow(
+        ('Ингредиент', 'Единица измерения', 'Количество')).encode('utf-8')
+    for row in shopping_list:
+        yield writer.writerow(row).encode('utf-8')
+
+
+def pdf_text(line):
+    "Строка для стандартного шрифта PDF без встраивания."
+    line = unidecode(line)
+    return line.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def pdf_page(lines):
+    "Страница PDF с текстовыми строками."
+    width, height = PDF_PAGE_SIZE
+    content = [f'BT /F1 {PDF_FONT_SIZE} Tf 50 {height - 50} Td 16 TL']
+    content.extend(f'({pdf_text(line)}) Tj T*' for line in lines)
+    content.append('ET')
+    return PdfDict(
+        Type=PdfName.Page,
+        MediaBox=PdfArray([0, 0, width, height]),
+        Resources=PdfDict(Font=PdfDict(F1=PdfDict(
+            Type=PdfName.Font,
+            Subtype=PdfName.Type1,
+            BaseFont=PdfName.Helvetica,
+            Encoding=PdfName.WinAnsiEncoding,
+        ))),
+        Contents=PdfDict(stream='\n'.join(content)),
+    )
+
+
+def render_pdf(shopping_list):
+    "Список покупок в виде PDF-файла."
+    lines = [SHOPPING_LIST_TITLE]
+    lines.extend(
+        f'{name}, {measurement_unit} - {amount}'
+        for name, measurement_unit, amount in shopping_list
+    )
+    writer = PdfWriter()
+    for start in range(0, len(lines), PDF_LINES_PER_PAGE):
+        writer.addpage(pdf_page(lines[start:start + PDF_LINES_PER_PAGE]))
+    file = io.BytesIO()
+    writer.write(file)
+    content = file.getvalue()
+    for start in range(0, len(content), CHUNK_SIZE):
+        yield content[start:start + CHUNK_SIZE]
+
+
+SHOPPING_LIST_FORMATS = {
+    'txt': (render_txt, 'text/plain; charset=utf-8'),
+    'csv': (render_csv, 'text/csv; charset=utf-8'),
+    'pdf': (render_pdf, 'application/pdf'),
+}
+
+
+def cart_version_key(user_id):
+    "Ключ версии списка покупок пользователя."
+    return f'shopping_cart:version:{user_id}'
+
+
+def bump_cart_version(*user_ids):
+    "Сброс закешированных списков покупок пользователей."
+    cache.set_many(
+        {cart_version_key(user_id): uuid4().hex for user_id in user_ids},
+        None
+    )
+
+
+def shopping_list_cache_key(user, export_format):
+    """Ключ кеша файла для текущей версии списка покупок
+    и справочника ингредиентов: в файле их названия и единицы."""
+    version = cache.get_or_set(cart_version_key(user.id), uuid4().hex, None)
+    catalog_version = get_catalog_version('ingredient')[0]
+    return (f'shopping_cart:{user.id}:{version}:{catalog_version}:'
+            f'{export_format}')
+
+
+def caching_chunks(chunks, key):
+    "Отдача частей файла с сохранением результата в кеш."
+    rendered = []
+    for chunk in chunks:
+        rendered.append(chunk)
+        yield chunk
+    cache.set(key, b''.join(rendered), settings.SHOPPING_CART_CACHE_TIMEOUT)
+
+
+def shopping_cart_response(user, export_format):
+    """Потоковая выгрузка списка покупок.
+    Возвращает None, если список покупок пуст."""
+    render, content_type = SHOPPING_LIST_FORMATS[export_format]
+    key = shopping_list_cache_key(user, export_format)
+    content = cache.get(key)
+    metrics.cache_lookup('shopping_list', content is not None)
+    if content is not None:
+        chunks = (content[start:start + CHUNK_SIZE]
+                  for start in range(0, len(content), CHUNK_SIZE))
+    elif ShoppingCart.objects.filter(user=user).exists():
+        chunks = caching_chunks(
+            render(get_shopping_list(user).iterator()), key)
+    else:
+        return None
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response['Content-Disposition'] = (
+        f'attachment; filename="shopping_list.{export_format}"')
+    return response
@@ -1,16 +1,114 @@
 import base64
+import binascii
+import hashlib
 import webcolors
 
-from django.core.files.base import ContentFile
+from django.conf import settings
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.utils.encoding import smart_str
+from PIL import Image
 from rest_framework import serializers
 
+from . import metrics
+
+
+def file_digest(file):
+    digest = hashlib.sha256()
+    for chunk in file.chunks():
+        digest.update(chunk)
+    return digest.digest()
+
+
+def same_image(current, new):
+    """Совпадает ли новое изображение с уже сохраненным.
+    Если сохраненного файла нет в хранилище, изображения разные."""
+    if new is current:
+        return True
+    if not current:
+        return False
+    try:
+        if current.size != new.size:
+            return False
+        with current.open('rb') as file:
+            stored = file_digest(file)
+    except OSError:
+        return False
+    uploaded = file_digest(new)
+    new.seek(0)
+    return stored == uploaded
+
+
+def decoded_size(payload):
+    "Размер данных base64 после декодирования, без декодирования."
+    padding = len(payload) - len(payload.rstrip('='))
+    return len(payload) // 4 * 3 - min(padding, 2)
+
 
 class Base64ImageField(serializers.ImageField):
+    """Изображение в виде data URL: data:image/png;base64,...
+    Тип и размер проверяются до декодирования, данные декодируются
+    частями во временный файл, а размеры картинки читаются
+    из заголовка без загрузки пикселей."""
+    default_error_messages = {
+        'image_type': 'Допустимые типы изображений: {types}.',
+        'image_encoding': 'Изображение должно быть закодировано в base64.',
+        'image_size': 'Размер изображения больше {max_size} байт.',
+        'image_content': 'Файл не является изображением {mime_type}.',
+        'image_dimensions': 'Изображение больше {max_pixels} пикселей.',
+    }
+
+    def decode(self, data):
+        header, separator, payload = data.partition(',')
+        mime_type = header[len('data:'):].partition(';')[0].lower()
+        if not separator or not header.endswith(';base64'):
+            self.fail('image_encoding')
+        if mime_type not in settings.RECIPE_IMAGE_TYPES:
+            self.fail('image_type', types=', '.join(
+                settings.RECIPE_IMAGE_TYPES))
+        if len(payload) % 4:
+            self.fail('image_encoding')
+        size = decoded_size(payload)
+        if size > settings.RECIPE_IMAGE_MAX_SIZE:
+            self.fail('image_size', max_size=settings.RECIPE_IMAGE_MAX_SIZE)
+        ext = mime_type.split('/')[-1]
+        file = TemporaryUploadedFile(
+            'temp.' + ext, mime_type, size, None)
+        chunk_size = settings.RECIPE_IMAGE_DECODE_CHUNK // 4 * 4
+        try:
+            for start in range(0, len(payload), chunk_size):
+                file.write(base64.b64decode(
+                    payload[start:start + chunk_size], validate=True))
+        except (binascii.Error, ValueError):
+            file.close()
+            self.fail('image_encoding')
+        file.seek(0)
+        self.check_image(file, mime_type)
+        metrics.image_uploaded(size)
+        return file
+
+    def check_image(self, file, mime_type):
+        try:
+            with Image.open(file.temporary_file_path()) as image:
+                image_format = image.format
+                width, height = image.size
+        except (OSError, Image.DecompressionBombError):
+            image_format = width = height = None
+        if image_format != settings.RECIPE_IMAGE_TYPES[mime_type]:
+            file.close()
+            self.fail('image_content', mime_type=mime_type)
+        if width * height > settings.RECIPE_IMAGE_MAX_PIXELS:
+            file.close()
+            self.fail('image_dimensions',
+                      max_pixels=settings.RECIPE_IMAGE_MAX_PIXELS)
+
     def to_internal_value(self, data):
+        instance = getattr(self.parent, 'instance', None)
+        current = getattr(instance, self.source, None)
+        if (isinstance(data, str) and current
+                and data.endswith((current.name, current.url))):
+            return current
         if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
-            ext = format.split('/')[-1]
-            data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
+            data = self.decode(data)
         return super().to_internal_value(data)
 
 
@@ -25,3 +123,21 @@ class Hex2NameColor(serializers.Field):
         except ValueError:
             raise serializers.ValidationError('Для этого цвета нет имени')
         return data
+
+
+class CatalogRelatedField(serializers.SlugRelatedField):
+    """SlugRelatedField, который ищет объекты в справочнике
+    из памяти процесса, а не запросом к базе на каждый элемент."""
+    def __init__(self, catalog, **kwargs):
+        self.catalog = catalog
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        try:
+            obj = self.catalog.lookup(self.slug_field, data)
+        except (TypeError, ValueError):
+            self.fail('invalid')
+        if obj is None:
+            self.fail('does_not_exist', slug_name=self.slug_field,
+                      value=smart_str(data))
+        return obj
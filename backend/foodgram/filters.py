@@ -1,13 +1,53 @@
-import django_filters
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection
+from django.core.exceptions import ValidationError
+from django.db.models import Exists, F, OuterRef, Q
+from django_filters import fields
 from django_filters import rest_framework as filters
 
-from .models import Ingredient, Recipe, Tag
+from . import catalog
+from .models import Recipe, RecipeIngredient, Tag
+from .search import UnicodeLower
+from .user_sets import CART, FAVORITES, get_user_set
+
+
+class CatalogMultipleChoiceField(fields.ModelMultipleChoiceField):
+    "Проверка значений по справочнику в памяти, без запроса к базе."
+    def __init__(self, *args, catalog, **kwargs):
+        self.catalog = catalog
+        super().__init__(*args, **kwargs)
+
+    def _check_values(self, value):
+        try:
+            value = frozenset(value)
+        except TypeError:
+            raise ValidationError(
+                self.error_messages['invalid_list'], code='invalid_list')
+        result = []
+        for key in value:
+            try:
+                obj = self.catalog.lookup(self.to_field_name or 'pk', key)
+            except (TypeError, ValueError):
+                raise ValidationError(
+                    self.error_messages['invalid_pk_value'],
+                    code='invalid_pk_value', params={'pk': key})
+            if obj is None:
+                raise ValidationError(
+                    self.error_messages['invalid_choice'],
+                    code='invalid_choice', params={'value': key})
+            result.append(obj)
+        return result
+
+
+class CatalogMultipleChoiceFilter(filters.ModelMultipleChoiceFilter):
+    field_class = CatalogMultipleChoiceField
 
 
 class RecipeFilter(filters.FilterSet):
     "Фильтр для модели Recipe"
     author = filters.NumberFilter()
-    tags = filters.ModelMultipleChoiceFilter(
+    tags = CatalogMultipleChoiceFilter(
+        catalog=catalog.tags,
         queryset=Tag.objects.all(),
         field_name="tags__slug",
         to_field_name='slug'
@@ -21,30 +61,44 @@ class RecipeFilter(filters.FilterSet):
         method='filter_is_in_shopping_cart'
     )
 
+    search = filters.CharFilter(method='filter_search')
+
     class Meta:
         model = Recipe
-        fields = ('tags', 'is_favorited', 'is_in_shopping_cart')
-
-    def filter_is_favorited(self, queryset, is_favorited, mean):
-        user = self.request.user
-        if mean == 1:
-            return queryset.filter(favorite__user=user)
-        return queryset.exclude(favorite__user=user)
+        fields = ('tags', 'is_favorited', 'is_in_shopping_cart', 'search')
 
-    def filter_is_in_shopping_cart(self, queryset, is_in_shopping_cart, mean):
-        user = self.request.user
+    def filter_by_user_set(self, queryset, name, mean):
+        ids = list(get_user_set(self.request.user, name))
         if mean == 1:
-            return queryset.filter(shoping__user=user)
-        return queryset.exclude(shoping__user=user)
+            return queryset.filter(id__in=ids)
+        return queryset.exclude(id__in=ids)
 
+    def filter_is_favorited(self, queryset, is_favorited, mean):
+        return self.filter_by_user_set(queryset, FAVORITES, mean)
 
-class IngredientFilter(filters.FilterSet):
-    "Фильтр для модели Ingredient"
-    name = django_filters.CharFilter(
-        field_name='name',
-        lookup_expr='icontains',
-    )
+    def filter_is_in_shopping_cart(self, queryset, is_in_shopping_cart, mean):
+        return self.filter_by_user_set(queryset, CART, mean)
 
-    class Meta:
-        model = Ingredient
-        fields = ('name',)
+    def filter_search(self, queryset, search, value):
+        value = value.strip()
+        if not value:
+            return queryset
+        if connection.vendor == 'postgresql':
+            query = SearchQuery(
+                value, config='russian', search_type='websearch')
+            return queryset.filter(search_vector=query).annotate(
+                rank=SearchRank(F('search_vector'), query)).order_by(
+                    '-rank', '-pub_date')
+        # icontains в SQLite не сравнивает кириллицу без учета регистра.
+        value = value.lower()
+        ingredients = RecipeIngredient.objects.alias(
+            ingredient_name=UnicodeLower('ingredient__name')).filter(
+                recipe=OuterRef('pk'), ingredient_name__contains=value)
+        return queryset.alias(
+            name_lower=UnicodeLower('name'),
+            text_lower=UnicodeLower('text'),
+        ).filter(
+            Q(name_lower__contains=value)
+            | Q(text_lower__contains=value)
+            | Exists(ingredients)
+        )
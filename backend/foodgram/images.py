@@ -0,0 +1,164 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .models import Recipe
+
+logger = logging.getLogger(__name__)
+
+WEBP = 'webp'
+FALLBACK_FORMATS = {
+    'jpg': 'JPEG',
+    'jpeg': 'JPEG',
+    'png': 'PNG',
+}
+
+executor = None
+
+
+def fallback_extension(name):
+    "Расширение уменьшенных копий в исходном формате: jpeg или png."
+    ext = os.path.splitext(name)[1].lstrip('.').lower()
+    return ext if ext in FALLBACK_FORMATS else 'png'
+
+
+def variant_name(name, width, ext=None):
+    """Имя уменьшенной копии рядом с оригиналом:
+    foodgram/images/cake.jpg -> foodgram/images/cake_480.webp."""
+    stem = os.path.splitext(name)[0]
+    return f'{stem}_{width}.{ext or fallback_extension(name)}'
+
+
+def variant_names(name):
+    for width in settings.RECIPE_IMAGE_WIDTHS.values():
+        yield variant_name(name, width)
+        yield variant_name(name, width, WEBP)
+
+
+def image_storage():
+    return Recipe._meta.get_field('image').storage
+
+
+def save_image(image, name, ext):
+    buffer = ContentFile(b'')
+    if ext == WEBP:
+        image.save(buffer, 'WEBP', quality=80, method=4)
+    elif FALLBACK_FORMATS[ext] == 'JPEG':
+        image.convert('RGB').save(
+            buffer, 'JPEG', quality=85, optimize=True, progressive=True)
+    else:
+        image.save(buffer, 'PNG', optimize=True)
+    image_storage().save_exact(name, buffer)
+
+
+def variant_widths(name):
+    "Настоящая ширина готовых копий по их заголовкам."
+    storage = image_storage()
+    widths = {}
+    for width in settings.RECIPE_IMAGE_WIDTHS.values():
+        with storage.open(variant_name(name, width), 'rb') as file:
+            with Image.open(file) as image:
+                widths[str(width)] = image.width
+    return widths
+
+
+def make_variants(name):
+    """Уменьшенные копии изображения для каждой ширины, в webp и в исходном.
+    Копии одинаковых изображений общие и создаются один раз.
+    Маленькие изображения не увеличиваются, поэтому возвращается
+    настоящая ширина каждой копии: {'480': 320, '1200': 320}."""
+    storage = image_storage()
+    if all(storage.exists(variant) for variant in variant_names(name)):
+        return variant_widths(name)
+    widths = {}
+    with storage.open(name, 'rb') as file:
+        with Image.open(file) as original:
+            original = ImageOps.exif_transpose(original)
+            if original.mode not in ('RGB', 'RGBA'):
+                transparent = (original.mode in ('LA', 'PA')
+                               or 'transparency' in original.info)
+                original = original.convert('RGBA' if transparent else 'RGB')
+            for width in settings.RECIPE_IMAGE_WIDTHS.values():
+                image = original.copy()
+                image.thumbnail((width, width * 4), Image.LANCZOS)
+                save_image(image, variant_name(name, width),
+                           fallback_extension(name))
+                save_image(image, variant_name(name, width, WEBP), WEBP)
+                widths[str(width)] = image.width
+    return widths
+
+
+def resize_recipe_image(recipe_id, name):
+    """Создание копий и отметка о готовности,
+    если у рецепта за это время не сменилось изображение.
+    Время изменения обновляется: ответ с копиями получит новый ETag."""
+    try:
+        widths = make_variants(name)
+    except Exception:
+        logger.exception('Не удалось уменьшить изображение %s', name)
+        return False
+    return Recipe.objects.filter(pk=recipe_id, image=name).update(
+        image_resized=True, image_widths=widths,
+        updated_at=timezone.now()) > 0
+
+
+def run_in_background(recipe_id, name):
+    try:
+        resize_recipe_image(recipe_id, name)
+    finally:
+        connection.close()
+
+
+def schedule_resize(recipe_id, name):
+    """Уменьшение изображения вне потока запроса.
+    Без RECIPE_IMAGE_ASYNC выполняется сразу, например в командах."""
+    global executor
+    if not settings.RECIPE_IMAGE_ASYNC:
+        resize_recipe_image(recipe_id, name)
+        return
+    if executor is None:
+        executor = ThreadPoolExecutor(
+            max_workers=settings.RECIPE_IMAGE_WORKERS,
+            thread_name_prefix='recipe-images',
+        )
+    executor.submit(run_in_background, recipe_id, name)
+
+
+def image_url(request, name):
+    url = image_storage().url(name)
+    return request.build_absolute_uri(url) if request is not None else url
+
+
+def image_srcset(request, recipe, ext=None):
+    """Значение srcset по готовым копиям изображения рецепта
+    с их настоящей шириной. Из копий одной ширины берется меньшая."""
+    if not recipe.image or not recipe.image_resized:
+        return None
+    variants = {}
+    for width in sorted(settings.RECIPE_IMAGE_WIDTHS.values()):
+        real_width = recipe.image_widths.get(str(width))
+        if real_width is not None:
+            variants.setdefault(real_width, width)
+    if not variants:
+        return None
+    return ', '.join(
+        f'{image_url(request, variant_name(recipe.image.name, width, ext))} '
+        f'{real_width}w'
+        for real_width, width in variants.items()
+    )
+
+
+def card_image_url(request, recipe):
+    "Ссылка на копию для карточки, пока ее нет - на оригинал."
+    if not recipe.image:
+        return None
+    if not recipe.image_resized:
+        return image_url(request, recipe.image.name)
+    return image_url(request, variant_name(
+        recipe.image.name, settings.RECIPE_IMAGE_WIDTHS['card']))
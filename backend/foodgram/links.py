@@ -0,0 +1,176 @@
+from django.db import connection
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal
+
+from .models import Favorite, Follow, ShoppingCart
+
+RECIPE_FIELDS = (
+    'name', 'image', 'image_resized', 'image_widths', 'cooking_time')
+
+# Поле связи и поля цели, которые нужны для ответа.
+LINKS = {
+    Favorite: ('recipe', RECIPE_FIELDS),
+    ShoppingCart: ('recipe', RECIPE_FIELDS),
+    Follow: ('author', ('email', 'username', 'first_name', 'last_name')),
+}
+
+
+def link_parts(model):
+    field_name, fields = LINKS[model]
+    field = model._meta.get_field(field_name)
+    quote = connection.ops.quote_name
+    return (
+        field,
+        quote(model._meta.db_table),
+        quote(field.column),
+        quote(field.related_model._meta.db_table),
+        ', '.join(quote(name) for name in ('id',) + fields),
+    )
+
+
+def add_link_orm(model, user, target_id):
+    "add_link для баз без изменяющих данные CTE: get_or_create."
+    field_name, fields = LINKS[model]
+    field = model._meta.get_field(field_name)
+    target = field.related_model.objects.only(*fields).filter(
+        id=target_id).first()
+    if target is None:
+        return None
+    _, target.created = model.objects.get_or_create(
+        user=user, **{field_name: target})
+    return target
+
+
+def add_link(model, user, target_id):
+    """Добавление рецепта в избранное или корзину, подписка на автора
+    одним запросом INSERT ... ON CONFLICT DO NOTHING.
+    Возвращает цель с полями для ответа и признаком created
+    или None, если цели нет. Повторный и параллельный такой же запрос
+    ничего не меняет и получает created=False.
+    Вне PostgreSQL то же самое делается через ORM."""
+    if connection.vendor != 'postgresql':
+        return add_link_orm(model, user, target_id)
+    field, table, column, target_table, columns = link_parts(model)
+    target = next(iter(field.related_model.objects.raw(
+        f'WITH inserted AS ('
+        f'INSERT INTO {table} (user_id, {column}) '
+        f'SELECT %s, id FROM {target_table} WHERE id = %s '
+        f'ON CONFLICT DO NOTHING RETURNING id) '
+        f'SELECT {columns}, (SELECT id FROM inserted) AS link_id '
+        f'FROM {target_table} WHERE id = %s',
+        [user.id, target_id, target_id]
+    )), None)
+    if target is None:
+        return None
+    target.created = target.link_id is not None
+    if target.created:
+        # Сигналы, как при save(): пересчет списка покупок и кешей.
+        post_save.send(
+            sender=model, created=True, update_fields=None, raw=False,
+            using=connection.alias,
+            instance=model(id=target.link_id, user=user,
+                           **{field.attname: target.id}))
+    return target
+
+
+def remove_link(model, user, target_id):
+    """Удаление связи одним запросом DELETE ... RETURNING.
+    Возвращает True, если связь была."""
+    field, table, column, _, _ = link_parts(model)
+    if connection.vendor != 'postgresql':
+        deleted, _ = model.objects.filter(
+            user=user, **{field.attname: target_id}).delete()
+        return bool(deleted)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {table} WHERE user_id = %s AND {column} = %s '
+            f'RETURNING id',
+            [user.id, target_id])
+        row = cursor.fetchone()
+    if row is None:
+        return False
+    post_delete.send(
+        sender=model, origin=None, using=connection.alias,
+        instance=model(id=row[0], user=user, **{field.attname: target_id}))
+    return True
+
+
+links_changed = Signal()
+
+ADDED = 'added'
+ALREADY = 'already'
+REMOVED = 'removed'
+ABSENT = 'absent'
+NOT_FOUND = 'not_found'
+
+
+def changed_links_postgresql(model, user, target_ids, present):
+    "Изменение списка связей одним запросом с изменяющим данные CTE."
+    field, table, column, target_table, _ = link_parts(model)
+    if present:
+        change = (
+            f'INSERT INTO {table} (user_id, {column}) '
+            f'SELECT %s, id FROM {target_table} WHERE id = ANY(%s) '
+            f'ON CONFLICT DO NOTHING RETURNING {column}')
+    else:
+        change = (
+            f'DELETE FROM {table} WHERE user_id = %s AND {column} = ANY(%s) '
+            f'RETURNING {column}')
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'WITH changed AS ({change}) '
+            f'SELECT target.id, changed.{column} IS NOT NULL '
+            f'FROM {target_table} target '
+            f'LEFT JOIN changed ON changed.{column} = target.id '
+            f'WHERE target.id = ANY(%s)',
+            [user.id, target_ids, target_ids])
+        return dict(cursor.fetchall())
+
+
+def changed_links_orm(model, user, target_ids, present):
+    """change_links для баз без изменяющих данные CTE: цели и связи
+    читаются через ORM, меняются только нужные строки.
+    Возвращает {id существующей цели: изменилась ли связь}."""
+    field, table, column, _, _ = link_parts(model)
+    targets = set(field.related_model.objects.filter(
+        id__in=target_ids).values_list('id', flat=True))
+    linked = set(model.objects.filter(
+        user=user, **{f'{field.attname}__in': targets}).values_list(
+            field.attname, flat=True))
+    changed = targets - linked if present else linked
+    if present:
+        model.objects.bulk_create(
+            (model(user=user, **{field.attname: pk}) for pk in changed),
+            ignore_conflicts=True)
+    elif changed:
+        # Без post_delete на каждую строку: изменения сообщает
+        # один links_changed.
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {table} WHERE user_id = %s AND {column} IN '
+                f'({", ".join(["%s"] * len(changed))})',
+                [user.id, *changed])
+    return {pk: pk in changed for pk in targets}
+
+
+def change_links(model, user, target_ids, present):
+    """Добавление или удаление связей сразу для списка целей
+    одним запросом. Возвращает {id цели: итог}: added или already
+    при добавлении, removed или absent при удалении, not_found,
+    если цели нет. После изменения отправляется один links_changed
+    со списком целей, которые действительно изменились.
+    Вне PostgreSQL то же самое делается несколькими запросами."""
+    target_ids = list(dict.fromkeys(target_ids))
+    outcomes = (ADDED, ALREADY) if present else (REMOVED, ABSENT)
+    if connection.vendor == 'postgresql':
+        rows = changed_links_postgresql(model, user, target_ids, present)
+    else:
+        rows = changed_links_orm(model, user, target_ids, present)
+    changed = [pk for pk in target_ids if rows.get(pk)]
+    if changed:
+        links_changed.send(
+            sender=model, user=user, target_ids=changed, present=present)
+    return {
+        pk: NOT_FOUND if pk not in rows else outcomes[not rows[pk]]
+        for pk in target_ids
+    }
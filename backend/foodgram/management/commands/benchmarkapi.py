@@ -0,0 +1,206 @@
+import json
+import random
+import statistics
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.authtoken.models import Token
+
+from foodgram.models import Ingredient, Recipe, ShoppingCart, Tag
+from foodgram.synthetic import PREFIX
+
+User = get_user_model()
+
+
+def percentile(values, fraction):
+    "Значение по рангу в отсортированном списке."
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class Scenarios:
+    "Адреса запросов к основным эндпоинтам со случайными параметрами."
+
+    def __init__(self, rng):
+        self.rng = rng
+        self.recipes = list(Recipe.objects.values_list('id', flat=True))
+        self.authors = list(Recipe.objects.order_by().values_list(
+            'author_id', flat=True).distinct())
+        self.tags = list(Tag.objects.values_list('slug', flat=True))
+        self.ingredients = list(Ingredient.objects.values_list(
+            'name', flat=True)[:1000])
+        if not self.recipes:
+            raise CommandError('Нет рецептов, запустите generatedata')
+
+    def recipe_list(self):
+        "Лента: первые страницы, иногда с фильтрами."
+        params = [f'limit={self.rng.choice((6, 12, 50))}']
+        if self.tags and self.rng.random() < 0.5:
+            params.append(f'tags={self.rng.choice(self.tags)}')
+        if self.rng.random() < 0.2:
+            params.append(f'author={self.rng.choice(self.authors)}')
+        elif self.rng.random() < 0.2:
+            params.append('is_favorited=1')
+        else:
+            params.append(f'page={self.rng.randint(1, 5)}')
+        return '/api/recipes/?' + '&'.join(params)
+
+    def recipe_detail(self):
+        return f'/api/recipes/{self.rng.choice(self.recipes)}/'
+
+    def subscriptions(self):
+        return ('/api/users/subscriptions/?recipes_limit='
+                + str(self.rng.choice((3, 6))))
+
+    def download_shopping_cart(self):
+        return ('/api/recipes/download_shopping_cart/?format='
+                + self.rng.choice(('txt', 'csv')))
+
+    def ingredient_search(self):
+        name = self.rng.choice(self.ingredients) if self.ingredients else ''
+        return f'/api/ingredients/?name={name[:self.rng.randint(1, 4)]}'
+
+
+SCENARIOS = (
+    'recipe_list', 'recipe_detail', 'subscriptions',
+    'download_shopping_cart', 'ingredient_search',
+)
+
+
+class Command(BaseCommand):
+    help = 'measuring api latency in-process with concurrent clients'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=200,
+            help='requests per scenario'
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=4,
+            help='parallel client threads'
+        )
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=20,
+            help='number of synthetic users making requests'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='random seed'
+        )
+        parser.add_argument(
+            '--output',
+            help='write the json report to this file instead of stdout'
+        )
+        parser.add_argument(
+            'scenarios',
+            nargs='*',
+            help=f'scenarios to run: {", ".join(SCENARIOS)}'
+        )
+
+    def tokens(self, count):
+        "Токены пользователей с корзиной, чтобы выгрузка была непустой."
+        users = list(User.objects.filter(
+            username__startswith=PREFIX,
+            id__in=ShoppingCart.objects.values('user_id'),
+        ).order_by('id')[:count])
+        if not users:
+            raise CommandError('Нет синтетических пользователей с корзиной')
+        return [Token.objects.get_or_create(user=user)[0].key
+                for user in users]
+
+    def request(self, url, token):
+        "Один запрос в своем потоке: время, число запросов к БД, статус."
+        client = getattr(self.local, 'client', None)
+        if client is None:
+            client = self.local.client = Client()
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = client.get(url, HTTP_AUTHORIZATION=f'Token {token}')
+            if response.streaming:
+                b''.join(response.streaming_content)
+            elapsed = time.perf_counter() - start
+        return elapsed, len(queries), response.status_code
+
+    def close_connections(self, executor, concurrency):
+        "Закрытие соединений с БД в каждом потоке пула."
+        barrier = threading.Barrier(concurrency)
+
+        def close():
+            connection.close()
+            barrier.wait()
+
+        for future in [executor.submit(close) for _ in range(concurrency)]:
+            future.result()
+
+    def run_scenario(self, executor, urls, tokens):
+        start = time.perf_counter()
+        results = list(executor.map(
+            self.request, urls,
+            (tokens[index % len(tokens)] for index in range(len(urls)))))
+        wall = time.perf_counter() - start
+        timings = sorted(elapsed * 1000 for elapsed, _, _ in results)
+        queries = [count for _, count, _ in results]
+        statuses = Counter(str(status) for _, _, status in results)
+        return {
+            'requests': len(results),
+            'statuses': dict(sorted(statuses.items())),
+            'p50_ms': round(percentile(timings, 0.50), 2),
+            'p95_ms': round(percentile(timings, 0.95), 2),
+            'p99_ms': round(percentile(timings, 0.99), 2),
+            'mean_ms': round(statistics.mean(timings), 2),
+            'queries_mean': round(statistics.mean(queries), 2),
+            'queries_max': max(queries),
+            'throughput_rps': round(len(results) / wall, 1),
+        }
+
+    def handle(self, *args, **options):
+        names = options['scenarios'] or SCENARIOS
+        unknown = set(names) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f'Неизвестные сценарии: {", ".join(unknown)}')
+        rng = random.Random(options['seed'])
+        scenarios = Scenarios(rng)
+        tokens = self.tokens(options['users'])
+        self.local = threading.local()
+        report = {
+            'vendor': connection.vendor,
+            'concurrency': options['concurrency'],
+            'dataset': {
+                'users': User.objects.count(),
+                'recipes': len(scenarios.recipes),
+            },
+            'scenarios': {},
+        }
+        hosts = [*settings.ALLOWED_HOSTS, 'testserver']
+        concurrency = options['concurrency']
+        with override_settings(ALLOWED_HOSTS=hosts), ThreadPoolExecutor(
+                max_workers=concurrency) as executor:
+            for name in names:
+                urls = [getattr(scenarios, name)()
+                        for _ in range(options['requests'])]
+                report['scenarios'][name] = self.run_scenario(
+                    executor, urls, tokens)
+            self.close_connections(executor, concurrency)
+        content = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(content)
+        else:
+            self.stdout.write(content)
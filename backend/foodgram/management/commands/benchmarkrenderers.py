@@ -0,0 +1,121 @@
+import random
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory, override_settings
+from django.utils.text import compress_string
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from foodgram.middleware import brotli
+from foodgram.models import Ingredient, Recipe, RecipeIngredient, Tag
+from foodgram.renderers import FastJSONRenderer
+from foodgram.serializers import RecipeGETSerializer
+
+User = get_user_model()
+
+RENDERERS = {
+    'json': JSONRenderer,
+    'fast': FastJSONRenderer,
+}
+
+
+class Command(BaseCommand):
+    help = 'comparing json renderers on a page of synthetic recipes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recipes',
+            type=int,
+            default=50,
+            help='recipes per page, rolled back afterwards'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=200,
+            help='renders per renderer'
+        )
+
+    def generate(self, count):
+        "Рецепты с тегами и ингредиентами, как на странице ленты."
+        author = User.objects.create(
+            username='render_benchmark', email='render@benchmark.local',
+            first_name='Иван', last_name='Петров')
+        tags = list(Tag.objects.all()[:3]) or [Tag.objects.create(
+            name='Завтрак', color='#E26C2D', slug='render_benchmark')]
+        ingredients = list(Ingredient.objects.all()[:200]) or [
+            Ingredient.objects.create(
+                name='мука пшеничная', measurement_unit='г')]
+        recipes = Recipe.objects.bulk_create(
+            Recipe(author=author,
+                   name=f'Пирог с начинкой №{number}',
+                   text='Смешать, выложить в форму и запекать 40 минут. ' * 4,
+                   image='foodgram/images/benchmark.png',
+                   cooking_time=random.randint(5, 120))
+            for number in range(count)
+        )
+        lines = RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(ingredient=random.choice(ingredients),
+                             amount=random.randint(1, 500))
+            for _ in range(count * 8)
+        )
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe_id=recipe.id, tag_id=tag.id)
+            for recipe in recipes for tag in tags[:2]
+        )
+        Recipe.ingredients.through.objects.bulk_create(
+            Recipe.ingredients.through(
+                recipe_id=recipe.id, recipeingredient_id=line.id)
+            for index, recipe in enumerate(recipes)
+            for line in lines[index * 8:index * 8 + 8]
+        )
+        return Recipe.objects.filter(author=author).with_related()
+
+    def page(self, recipes):
+        request = Request(RequestFactory().get('/api/recipes/'))
+        request.user = AnonymousUser()
+        results = RecipeGETSerializer(
+            recipes, many=True, context={'request': request}).data
+        return {
+            'count': len(results),
+            'next': 'http://localhost/api/recipes/?page=2',
+            'previous': None,
+            'results': results,
+        }
+
+    def measure(self, function, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = function()
+            timings.append((time.perf_counter() - start) * 1000)
+        return result, statistics.median(timings)
+
+    def handle(self, *args, **options):
+        hosts = [*settings.ALLOWED_HOSTS, 'testserver']
+        with override_settings(ALLOWED_HOSTS=hosts), transaction.atomic():
+            data = self.page(self.generate(options['recipes']))
+            transaction.set_rollback(True)
+        for name, renderer_class in RENDERERS.items():
+            renderer = renderer_class()
+            content, median = self.measure(
+                lambda: renderer.render(data), options['repeat'])
+            self.stdout.write(
+                f'{name}: {len(content)} bytes, p50 {median:.3f} ms')
+        _, median = self.measure(
+            lambda: compress_string(content), options['repeat'])
+        self.stdout.write(
+            f'gzip: {len(compress_string(content))} bytes, '
+            f'p50 {median:.3f} ms')
+        if brotli is not None:
+            compressed, median = self.measure(
+                lambda: brotli.compress(content, quality=4),
+                options['repeat'])
+            self.stdout.write(
+                f'brotli: {len(compressed)} bytes, p50 {median:.3f} ms')
@@ -0,0 +1,102 @@
+import random
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from foodgram.filters import RecipeFilter
+from foodgram.models import Ingredient, Recipe, RecipeIngredient
+
+User = get_user_model()
+
+DEFAULT_QUERIES = ('сыр', 'курица с картофелем', 'шоколадный торт', 'мёд')
+
+
+class Command(BaseCommand):
+    help = 'measuring recipe search latency on synthetic recipes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recipes',
+            type=int,
+            default=100000,
+            help='number of synthetic recipes, rolled back afterwards'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=20,
+            help='runs per query'
+        )
+        parser.add_argument(
+            'queries',
+            nargs='*',
+            default=DEFAULT_QUERIES,
+            help='search queries'
+        )
+
+    def generate(self, count):
+        "Синтетические рецепты из названий ингредиентов каталога."
+        names = list(Ingredient.objects.values_list('name', flat=True))
+        recipe_ingredients = list(RecipeIngredient.objects.all()[:500])
+        if not names or not recipe_ingredients:
+            ingredient = Ingredient.objects.create(
+                name='benchmark', measurement_unit='г')
+            names = names or [ingredient.name]
+            recipe_ingredients = [RecipeIngredient.objects.create(
+                ingredient=ingredient, amount=1)]
+        author = User.objects.create(
+            username='search_benchmark', email='search@benchmark.local')
+        recipes = Recipe.objects.bulk_create(
+            (Recipe(author=author,
+                    name=' '.join(random.sample(names, 2))[:25],
+                    text=' '.join(random.choices(names, k=8))[:200],
+                    image='foodgram/images/benchmark.png',
+                    cooking_time=random.randint(5, 120))
+             for _ in range(count)),
+            batch_size=5000
+        )
+        Recipe.ingredients.through.objects.bulk_create(
+            (Recipe.ingredients.through(
+                recipe_id=recipe.id,
+                recipeingredient_id=recipe_ingredient.id)
+             for recipe in recipes
+             for recipe_ingredient in random.sample(
+                 recipe_ingredients, min(3, len(recipe_ingredients)))),
+            batch_size=5000,
+            ignore_conflicts=True
+        )
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE foodgram_recipe')
+
+    def measure(self, query, repeat):
+        "Время выборки первой страницы и подсчета результатов, мс."
+        timings = []
+        recipe_filter = RecipeFilter()
+        for _ in range(repeat):
+            start = time.perf_counter()
+            queryset = recipe_filter.filter_search(
+                Recipe.objects.all(), 'search', query)
+            count = queryset.count()
+            list(queryset[:6])
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        return count, statistics.median(timings), timings[
+            max(0, int(len(timings) * 0.95) - 1)]
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            start = time.perf_counter()
+            self.generate(options['recipes'])
+            self.stdout.write(
+                f'{connection.vendor}: generated {options["recipes"]} '
+                f'recipes in {time.perf_counter() - start:.1f}s')
+            for query in options['queries']:
+                count, median, p95 = self.measure(query, options['repeat'])
+                self.stdout.write(
+                    f'{query!r}: {count} found, '
+                    f'p50 {median:.1f} ms, p95 {p95:.1f} ms')
+            transaction.set_rollback(True)
@@ -0,0 +1,52 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import get_runner
+
+from foodgram.tests.test_budgets import ENDPOINTS, QueryBudgetTest
+
+TEST_LABEL = 'foodgram.tests.test_budgets'
+
+
+class Command(BaseCommand):
+    help = ('checking that sql queries per api request fit the budget '
+            'and do not grow with page size or dataset size')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=int,
+            nargs=2,
+            default=QueryBudgetTest.sizes,
+            metavar=('SMALL', 'LARGE'),
+            help='number of recipes in the small and large dataset'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=QueryBudgetTest.seed,
+            help='random seed'
+        )
+        parser.add_argument(
+            'endpoints',
+            nargs='*',
+            help='endpoints to check, all by default'
+        )
+
+    def handle(self, *args, **options):
+        "Запуск QueryBudgetTest с заданными объемами данных и эндпоинтами."
+        label = TEST_LABEL
+        if options['endpoints']:
+            known = {endpoint.name for endpoint in ENDPOINTS}
+            unknown = set(options['endpoints']) - known
+            if unknown:
+                raise CommandError(
+                    f'Неизвестные эндпоинты: {", ".join(sorted(unknown))}')
+            QueryBudgetTest.endpoints = [
+                endpoint for endpoint in ENDPOINTS
+                if endpoint.name in options['endpoints']]
+            label = f'{TEST_LABEL}.QueryBudgetTest.test_budgets'
+        QueryBudgetTest.sizes = options['sizes']
+        QueryBudgetTest.seed = options['seed']
+        runner = get_runner(settings)(verbosity=options['verbosity'])
+        if runner.run_tests([label]):
+            raise CommandError('Бюджет запросов нарушен')
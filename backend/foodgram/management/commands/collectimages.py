@@ -0,0 +1,63 @@
+import os
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+from django.db import models
+
+from foodgram.images import image_storage, variant_names
+from foodgram.models import Recipe
+
+
+def image_references():
+    "Число рецептов, ссылающихся на каждый файл изображения."
+    return Counter(dict(
+        Recipe.objects.exclude(image='').values_list('image').annotate(
+            references=models.Count('id')).order_by()
+    ))
+
+
+class Command(BaseCommand):
+    help = 'removing image files that no recipe refers to'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--delete',
+            action='store_true',
+            help='delete orphaned files, otherwise only report them'
+        )
+        parser.add_argument(
+            '--grace',
+            type=int,
+            default=60 * 60,
+            help='keep files younger than this many seconds'
+        )
+
+    def handle(self, *args, **options):
+        storage = image_storage()
+        directory = Recipe._meta.get_field('image').upload_to
+        references = image_references()
+        keep = set(references)
+        for name in references:
+            keep.update(variant_names(name))
+        deadline = time.time() - options['grace']
+        referenced = orphaned = freed = 0
+        for filename in storage.listdir(directory)[1]:
+            name = os.path.join(directory, filename)
+            if name in keep:
+                referenced += 1
+                continue
+            if storage.get_modified_time(name).timestamp() > deadline:
+                continue
+            orphaned += 1
+            freed += storage.size(name)
+            if options['delete']:
+                storage.delete(name)
+                if options['verbosity'] > 1:
+                    self.stdout.write(f'deleted {name}')
+            elif options['verbosity'] > 1:
+                self.stdout.write(f'orphaned {name}')
+        self.stdout.write(self.style.SUCCESS(
+            f'referenced: {referenced}, orphaned: {orphaned}, '
+            f'{"freed" if options["delete"] else "reclaimable"}: '
+            f'{freed} bytes'))
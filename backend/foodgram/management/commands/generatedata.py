@@ -0,0 +1,71 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from foodgram.synthetic import PASSWORD, DatasetGenerator, clear_dataset
+
+
+class Command(BaseCommand):
+    help = 'generating a synthetic dataset for load testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=1000,
+            help='number of synthetic users'
+        )
+        parser.add_argument(
+            '--recipes',
+            type=int,
+            default=10000,
+            help='number of synthetic recipes'
+        )
+        parser.add_argument(
+            '--follows',
+            type=float,
+            default=10,
+            help='mean follows per user'
+        )
+        parser.add_argument(
+            '--favorites',
+            type=float,
+            default=20,
+            help='mean favorites per user'
+        )
+        parser.add_argument(
+            '--cart',
+            type=float,
+            default=3,
+            help='mean shopping cart recipes per user'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='random seed'
+        )
+        parser.add_argument(
+            '--clear',
+            action='store_true',
+            help='delete previously generated users and their data first'
+        )
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            self.stdout.write(f'deleted {clear_dataset()} synthetic users')
+        start = time.perf_counter()
+        generator = DatasetGenerator(
+            seed=options['seed'],
+            log=self.stdout.write if options['verbosity'] > 1 else None)
+        summary = generator.generate(
+            users=options['users'],
+            recipes=options['recipes'],
+            follows=options['follows'],
+            favorites=options['favorites'],
+            cart=options['cart'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            ', '.join(f'{name}: {count}' for name, count in summary.items())
+            + f' in {time.perf_counter() - start:.1f}s, '
+            f'password: {PASSWORD}'))
@@ -1,18 +1,108 @@
-import pandas as pd
+import csv
+import json
+import re
+from itertools import islice
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
 
+from foodgram.catalog import catalog_changed
 from foodgram.models import Ingredient
 
+READ_SIZE = 64 * 1024
+SEPARATORS = re.compile(r'[\s,]*')
+
+
+def read_csv(file):
+    "Ингредиенты из CSV-файла со строками вида: название,единица."
+    for row in csv.reader(file):
+        if len(row) >= 2:
+            yield row[0], row[1]
+
+
+def read_json(file):
+    "Ингредиенты из JSON-массива объектов, разбираемого по частям."
+    decoder = json.JSONDecoder()
+    buffer = file.read(READ_SIZE)
+    position = SEPARATORS.match(buffer).end()
+    if buffer[position:position + 1] != '[':
+        raise CommandError('Ожидается JSON-массив ингредиентов')
+    position += 1
+    while True:
+        position = SEPARATORS.match(buffer, position).end()
+        if buffer[position:position + 1] == ']':
+            return
+        try:
+            item, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            chunk = file.read(READ_SIZE)
+            if not chunk:
+                raise CommandError('Файл с ингредиентами поврежден')
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        yield item['name'], item['measurement_unit']
+
+
+READERS = {
+    'csv': read_csv,
+    'json': read_json,
+}
+
 
 class Command(BaseCommand):
-    help = 'importing data from csv'
+    help = 'importing ingredients from csv or json'
 
     def add_arguments(self, parser):
-        pass
+        parser.add_argument(
+            'path',
+            nargs='?',
+            default='data/ingredients.json',
+            help='path to ingredients.csv or ingredients.json'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='number of ingredients per query'
+        )
+
+    def load_batch(self, batch):
+        "Добавление отсутствующих ингредиентов пачки, вернет их число."
+        batch = set(batch)
+        existing = set(Ingredient.objects.filter(
+            name__in={name for name, _ in batch}).values_list(
+                'name', 'measurement_unit'))
+        missing = batch - existing
+        Ingredient.objects.bulk_create(
+            (Ingredient(name=name, measurement_unit=measurement_unit)
+             for name, measurement_unit in missing),
+            ignore_conflicts=True
+        )
+        return len(missing), len(batch) - len(missing)
 
     def handle(self, *args, **options):
-        df = pd.read_json('data/ingredients.json')
-        for import_name, import_unit in zip(df.name, df.measurement_unit):
-            models = Ingredient(name=import_name, measurement_unit=import_unit)
-            models.save()
+        path = options['path']
+        reader = READERS.get(path.rsplit('.', 1)[-1].lower())
+        if reader is None:
+            raise CommandError('Поддерживаются только файлы csv и json')
+        inserted = unchanged = 0
+        with open(path, encoding='utf-8') as file, transaction.atomic():
+            rows = (
+                (name.strip(), measurement_unit.strip())
+                for name, measurement_unit in reader(file)
+            )
+            while True:
+                batch = list(islice(rows, options['batch_size']))
+                if not batch:
+                    break
+                batch_inserted, batch_unchanged = self.load_batch(batch)
+                inserted += batch_inserted
+                unchanged += batch_unchanged
+            if inserted:
+                # bulk_create не отправляет post_save: справочник
+                # и поисковый индекс в процессах обновляются по версии.
+                transaction.on_commit(
+                    lambda: catalog_changed('ingredient'))
+        self.stdout.write(self.style.SUCCESS(
+            f'inserted: {inserted}, unchanged: {unchanged}'))
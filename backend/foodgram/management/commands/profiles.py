@@ -0,0 +1,107 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from foodgram.profiling import list_profiles, load_stats
+
+
+def function_name(key):
+    "Функция с коротким путем: от site-packages или от текущего каталога."
+    filename, line, name = key
+    if filename == '~':
+        return name
+    site_packages = f'site-packages{os.sep}'
+    if site_packages in filename:
+        filename = filename.split(site_packages)[-1]
+    elif not os.path.relpath(filename).startswith('..'):
+        filename = os.path.relpath(filename)
+    return f'{filename}:{line}({name})'
+
+
+class Command(BaseCommand):
+    help = ('listing, summarizing and comparing request profiles '
+            'captured by the profiling middleware')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'action',
+            choices=('list', 'show', 'diff'),
+            help='list profiles, show one profile or diff two profiles'
+        )
+        parser.add_argument(
+            'profiles',
+            nargs='*',
+            help='profile file names or paths for show and diff'
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=25,
+            help='number of functions to print'
+        )
+        parser.add_argument(
+            '--sort',
+            choices=('total', 'own'),
+            default='total',
+            help='sort functions by total or own time'
+        )
+        parser.add_argument(
+            '--view',
+            help='only list profiles of this view, e.g. RecipeViewSet.list'
+        )
+
+    def handle(self, *args, **options):
+        expected = {'list': 0, 'show': 1, 'diff': 2}[options['action']]
+        if len(options['profiles']) != expected:
+            raise CommandError(
+                f'{options["action"]}: нужно профилей - {expected}')
+        paths = [self.path(name) for name in options['profiles']]
+        getattr(self, f'handle_{options["action"]}')(*paths, **options)
+
+    def path(self, name):
+        for path in (name, os.path.join(settings.PROFILE_DIR, name)):
+            if os.path.isfile(path):
+                return path
+        raise CommandError(f'Профиль {name} не найден')
+
+    def handle_list(self, view=None, **options):
+        profiles = [
+            (name, fields) for name, fields in list_profiles()
+            if view is None or fields['view'] == view
+        ]
+        for name, fields in profiles:
+            self.stdout.write(
+                f'{fields["duration"]:>7}ms {fields["status"]} '
+                f'{fields["method"]:<6} {fields["view"]:<45} {name}')
+        self.stdout.write(
+            f'{len(profiles)} profiles in {settings.PROFILE_DIR}')
+
+    def handle_show(self, path, limit, sort, **options):
+        stats = load_stats(path)
+        column = 0 if sort == 'own' else 1
+        self.stdout.write(f'{"own, ms":>10} {"total, ms":>10}  function')
+        for key, times in sorted(
+                stats.items(), key=lambda item: -item[1][column])[:limit]:
+            self.stdout.write(
+                f'{times[0] * 1000:>10.1f} {times[1] * 1000:>10.1f}  '
+                f'{function_name(key)}')
+
+    def handle_diff(self, before_path, after_path, limit, sort, **options):
+        "Функции с наибольшим изменением времени между двумя профилями."
+        before = load_stats(before_path)
+        after = load_stats(after_path)
+        column = 0 if sort == 'own' else 1
+        changes = {
+            key: (after.get(key, (0, 0))[column]
+                  - before.get(key, (0, 0))[column])
+            for key in before.keys() | after.keys()
+        }
+        self.stdout.write(
+            f'{"before, ms":>11} {"after, ms":>10} {"change":>9}  function')
+        for key, change in sorted(
+                changes.items(), key=lambda item: -abs(item[1]))[:limit]:
+            self.stdout.write(
+                f'{before.get(key, (0, 0))[column] * 1000:>11.1f} '
+                f'{after.get(key, (0, 0))[column] * 1000:>10.1f} '
+                f'{change * 1000:>+9.1f}  {function_name(key)}')
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from foodgram.images import resize_recipe_image
+from foodgram.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'generating resized copies of recipe images'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='regenerate copies that are already marked as ready'
+        )
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='')
+        if not options['all']:
+            recipes = recipes.filter(image_resized=False)
+        done = failed = 0
+        for pk, name in recipes.values_list('id', 'image').iterator():
+            if resize_recipe_image(pk, name):
+                done += 1
+            else:
+                failed += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'resized: {done}, failed: {failed}'))
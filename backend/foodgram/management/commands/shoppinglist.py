@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from foodgram.models import ShoppingListItem
+from foodgram.shopping_list import diff_shopping_lists, live_totals
+
+
+class Command(BaseCommand):
+    help = 'verifying or rebuilding shopping list aggregates'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='rebuild aggregates from shopping carts'
+        )
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            with transaction.atomic():
+                ShoppingListItem.objects.all().delete()
+                items = ShoppingListItem.objects.bulk_create(
+                    (ShoppingListItem(user_id=user_id,
+                                      ingredient_id=ingredient_id,
+                                      amount=amount)
+                     for user_id, ingredient_id, amount
+                     in live_totals().iterator()),
+                    batch_size=1000
+                )
+            self.stdout.write(
+                self.style.SUCCESS(f'rebuilt {len(items)} rows'))
+            return
+        diff = diff_shopping_lists()
+        for (user_id, ingredient_id), (stored, expected) in diff.items():
+            self.stdout.write(
+                f'user {user_id}, ingredient {ingredient_id}: '
+                f'stored {stored}, expected {expected}')
+        if diff:
+            raise CommandError(
+                f'{len(diff)} mismatched rows, run with --rebuild')
+        self.stdout.write(self.style.SUCCESS('shopping lists are consistent'))
@@ -0,0 +1,103 @@
+import os
+from hmac import compare_digest
+
+from django.conf import settings
+from django.http import HttpResponse
+
+try:
+    import prometheus_client
+    from prometheus_client import Counter, Histogram, multiprocess
+except ImportError:
+    prometheus_client = None
+
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+SIZE_BUCKETS = tuple(2 ** power * 1024 for power in range(6, 15))
+
+if prometheus_client is not None:
+    REQUEST_DURATION = Histogram(
+        'foodgram_request_duration_seconds',
+        'Время обработки запроса',
+        ('view', 'method'),
+    )
+    RESPONSES = Counter(
+        'foodgram_responses',
+        'Ответы по статусам',
+        ('view', 'method', 'status'),
+    )
+    DB_QUERIES = Histogram(
+        'foodgram_db_queries',
+        'Число SQL-запросов на запрос',
+        ('view',),
+        buckets=QUERY_BUCKETS,
+    )
+    DB_DURATION = Histogram(
+        'foodgram_db_duration_seconds',
+        'Время SQL-запросов на запрос',
+        ('view',),
+    )
+    CACHE_REQUESTS = Counter(
+        'foodgram_cache_requests',
+        'Обращения к кешам: доля hit - это hit / (hit + miss)',
+        ('cache', 'result'),
+    )
+    IMAGE_UPLOAD_SIZE = Histogram(
+        'foodgram_image_upload_bytes',
+        'Размер загруженных изображений',
+        buckets=SIZE_BUCKETS,
+    )
+
+
+def enabled():
+    return prometheus_client is not None and settings.METRICS
+
+
+def observe_request(request, response, timings):
+    view = timings.view or 'unresolved'
+    REQUEST_DURATION.labels(view, request.method).observe(timings.total())
+    RESPONSES.labels(view, request.method, response.status_code).inc()
+    DB_QUERIES.labels(view).observe(timings.queries)
+    DB_DURATION.labels(view).observe(timings.db)
+
+
+def cache_lookup(name, hit):
+    "Попадание или промах кеша name."
+    if enabled():
+        CACHE_REQUESTS.labels(name, 'hit' if hit else 'miss').inc()
+
+
+def image_uploaded(size):
+    if enabled():
+        IMAGE_UPLOAD_SIZE.observe(size)
+
+
+def registry():
+    """Под gunicorn каждый воркер пишет метрики в файлы каталога
+    PROMETHEUS_MULTIPROC_DIR, и любой воркер отдает их сумму."""
+    if 'PROMETHEUS_MULTIPROC_DIR' not in os.environ:
+        return prometheus_client.REGISTRY
+    collector_registry = prometheus_client.CollectorRegistry()
+    multiprocess.MultiProcessCollector(collector_registry)
+    return collector_registry
+
+
+def allowed(request):
+    """Доступ к метрикам: по токену Bearer из METRICS_TOKEN
+    или, если токен не задан, с адресов из METRICS_ALLOWED_IPS."""
+    if settings.METRICS_TOKEN:
+        header = request.headers.get('Authorization', '')
+        return compare_digest(header, f'Bearer {settings.METRICS_TOKEN}')
+    return request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS
+
+
+def metrics_view(request):
+    "Метрики в текстовом формате Prometheus."
+    if not enabled():
+        return HttpResponse(
+            'Метрики выключены', status=404, content_type='text/plain')
+    if not allowed(request):
+        return HttpResponse(
+            'Доступ к метрикам запрещен', status=403,
+            content_type='text/plain')
+    return HttpResponse(
+        prometheus_client.generate_latest(registry()),
+        content_type=prometheus_client.CONTENT_TYPE_LATEST)
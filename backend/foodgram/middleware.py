@@ -0,0 +1,232 @@
+import logging
+import random
+import re
+import time
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_string
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+
+from . import metrics, profiling
+from .timing import current, measure_request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE_TYPES = re.compile(
+    r'^(text/|application/(json|javascript|xml|.*\+json))')
+
+
+def accepted_encodings(header):
+    "Кодировки из Accept-Encoding, кроме запрещенных через q=0."
+    encodings = set()
+    for item in header.split(','):
+        encoding, _, params = item.strip().partition(';')
+        quality = params.strip().partition('q=')[2]
+        try:
+            if quality and float(quality) == 0:
+                continue
+        except ValueError:
+            continue
+        encodings.add(encoding.strip().lower())
+    return encodings
+
+
+class CompressionMiddleware:
+    """Сжатие ответов brotli или gzip.
+    Маленькие ответы, потоковые выгрузки и уже сжатые данные
+    отдаются как есть."""
+
+    max_random_bytes = 100
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.process_response(request, self.get_response(request))
+
+    def process_response(self, request, response):
+        if (response.streaming
+                or response.has_header('Content-Encoding')
+                or len(response.content) < settings.COMPRESSION_MIN_SIZE
+                or not COMPRESSIBLE_TYPES.match(
+                    response.get('Content-Type', ''))):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encodings = accepted_encodings(
+            request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if brotli is not None and 'br' in encodings:
+            encoding = 'br'
+            content = brotli.compress(
+                response.content, quality=settings.BROTLI_QUALITY)
+        elif 'gzip' in encodings:
+            encoding = 'gzip'
+            content = compress_string(
+                response.content, max_random_bytes=self.max_random_bytes)
+        else:
+            return response
+        if len(content) >= len(response.content):
+            return response
+        response.content = content
+        response.headers['Content-Length'] = str(len(content))
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+
+def view_name(view_func, method):
+    """Имя вьюсета и действия, например RecipeViewSet.favorite,
+    для обычных функций - их имя."""
+    cls = getattr(view_func, 'cls', None)
+    if cls is None:
+        return getattr(view_func, '__qualname__', repr(view_func))
+    actions = getattr(view_func, 'actions', None) or {}
+    action = actions.get(method.lower())
+    return f'{cls.__name__}.{action}' if action else cls.__name__
+
+
+def is_admin(user):
+    return user is not None and user.is_authenticated and (
+        user.is_superuser or getattr(user, 'is_admin', False))
+
+
+class ServerTimingMiddleware:
+    """Число и время SQL-запросов, время сериализации и рендеринга
+    в заголовке Server-Timing и в логе. Включается для всех запросов
+    настройкой SERVER_TIMING или для администратора заголовком
+    X-Server-Timing. Без них запрос проходит без замеров."""
+
+    trigger_header = 'HTTP_X_SERVER_TIMING'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.SERVER_TIMING and (
+                self.trigger_header not in request.META):
+            return self.get_response(request)
+        with measure_request() as timings:
+            response = self.get_response(request)
+        if settings.SERVER_TIMING or is_admin(getattr(request, 'user', None)):
+            self.report(request, response, timings)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timings = current.get()
+        if timings is not None:
+            timings.view = view_name(view_func, request.method)
+
+    def process_template_response(self, request, response):
+        timings = current.get()
+        if timings is not None:
+            timings.rendering(response)
+        return response
+
+    def report(self, request, response, timings):
+        total = timings.total()
+        response.headers['Server-Timing'] = ', '.join((
+            f'db;dur={timings.db * 1000:.1f};desc="{timings.queries} queries"',
+            f'serialize;dur={timings.serialize * 1000:.1f}',
+            f'render;dur={timings.render * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ))
+        fields = {
+            'view': timings.view,
+            'method': request.method,
+            'status': response.status_code,
+            'queries': timings.queries,
+            'db_ms': round(timings.db * 1000, 1),
+            'serialize_ms': round(timings.serialize * 1000, 1),
+            'render_ms': round(timings.render * 1000, 1),
+            'total_ms': round(total * 1000, 1),
+        }
+        logger.info(
+            ' '.join(f'{name}=%s' for name in fields), *fields.values(),
+            extra={'timing': fields})
+
+
+class MetricsMiddleware:
+    """Метрики Prometheus по каждому запросу: время, статус,
+    число и время SQL-запросов. Включается настройкой METRICS."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not metrics.enabled():
+            return self.get_response(request)
+        with measure_request() as timings:
+            response = self.get_response(request)
+        metrics.observe_request(request, response, timings)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timings = current.get()
+        if timings is not None and timings.view is None:
+            timings.view = view_name(view_func, request.method)
+
+
+def request_user(request):
+    """Пользователь до вызова view: из сессии или по токену.
+    DRF аутентифицирует запрос позже, внутри view."""
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return user
+    try:
+        authenticated = TokenAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return None
+    return authenticated[0] if authenticated else None
+
+
+class ProfilingMiddleware:
+    """Профиль всего запроса в каталоге PROFILE_DIR.
+    Администратор запрашивает его заголовком X-Profile или параметром
+    ?profile=1, кроме того, профилируется каждый PROFILE_SAMPLE_RATE-й
+    запрос в среднем. Имя файла профиля возвращается в X-Profile."""
+
+    trigger_header = 'HTTP_X_PROFILE'
+    trigger_param = 'profile'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def should_profile(self, request):
+        rate = settings.PROFILE_SAMPLE_RATE
+        if rate and random.randrange(rate) == 0:
+            return True
+        if (self.trigger_header in request.META
+                or self.trigger_param in request.GET):
+            return is_admin(request_user(request))
+        return False
+
+    def __call__(self, request):
+        if not self.should_profile(request):
+            return self.get_response(request)
+        profiler = request.profiler = profiling.make_profiler()
+        start = time.perf_counter()
+        profiler.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.stop()
+        try:
+            response.headers['X-Profile'] = profiling.save_profile(
+                profiler, getattr(request, 'profiled_view', None),
+                request.method, response.status_code,
+                time.perf_counter() - start)
+        except OSError:
+            logger.exception('Не удалось сохранить профиль запроса')
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if hasattr(request, 'profiler'):
+            request.profiled_view = view_name(view_func, request.method)
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.2 on 2026-10-18 01:20
+
+from django.db import migrations, models
+
+
+def merge_duplicates(apps, schema_editor):
+    Ingredient = apps.get_model('foodgram', 'Ingredient')
+    RecipeIngredient = apps.get_model('foodgram', 'RecipeIngredient')
+    ShoppingCart = apps.get_model('foodgram', 'ShoppingCart')
+    ShoppingListItem = apps.get_model('foodgram', 'ShoppingListItem')
+    duplicates = Ingredient.objects.values(
+        'name', 'measurement_unit').annotate(
+            keep_id=models.Min('id'), count=models.Count('id')).filter(
+                count__gt=1).order_by()
+    for duplicate in duplicates:
+        keep_id = duplicate['keep_id']
+        extra_ids = list(Ingredient.objects.filter(
+            name=duplicate['name'],
+            measurement_unit=duplicate['measurement_unit']).exclude(
+                id=keep_id).values_list('id', flat=True))
+        RecipeIngredient.objects.filter(
+            ingredient_id__in=extra_ids).update(ingredient_id=keep_id)
+        ShoppingListItem.objects.filter(
+            ingredient_id__in=extra_ids + [keep_id]).delete()
+        Ingredient.objects.filter(id__in=extra_ids).delete()
+        totals = ShoppingCart.objects.filter(
+            recipe__ingredients__ingredient_id=keep_id).order_by().values(
+                'user_id').annotate(
+                    amount=models.Sum('recipe__ingredients__amount'))
+        ShoppingListItem.objects.bulk_create(
+            ShoppingListItem(user_id=total['user_id'], ingredient_id=keep_id,
+                             amount=total['amount'])
+            for total in totals
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodgram', '0019_shoppinglistitem'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,142 @@
+# Generated by Django 4.2.2 on 2026-10-18 01:25
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+FORWARD_SQL = (
+    """
+    CREATE OR REPLACE FUNCTION foodgram_recipe_search_vector(
+        recipe_id bigint, recipe_name text, recipe_text text
+    ) RETURNS tsvector AS $$
+        SELECT
+            setweight(to_tsvector('russian', coalesce(recipe_name, '')), 'A')
+            || setweight(to_tsvector('russian', coalesce((
+                SELECT string_agg(ingredient.name, ' ')
+                FROM foodgram_recipe_ingredients recipe_ingredients
+                JOIN foodgram_recipeingredient recipe_ingredient
+                    ON recipe_ingredient.id
+                    = recipe_ingredients.recipeingredient_id
+                JOIN foodgram_ingredient ingredient
+                    ON ingredient.id = recipe_ingredient.ingredient_id
+                WHERE recipe_ingredients.recipe_id = $1
+            ), '')), 'B')
+            || setweight(to_tsvector('russian', coalesce(recipe_text, '')), 'C')
+    $$ LANGUAGE sql STABLE;
+    """,
+    """
+    CREATE OR REPLACE FUNCTION foodgram_recipe_search_trigger()
+    RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector := foodgram_recipe_search_vector(
+            NEW.id, NEW.name, NEW.text);
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql;
+    """,
+    """
+    CREATE TRIGGER foodgram_recipe_search_update
+    BEFORE INSERT OR UPDATE OF name, text ON foodgram_recipe
+    FOR EACH ROW EXECUTE FUNCTION foodgram_recipe_search_trigger();
+    """,
+    """
+    CREATE OR REPLACE FUNCTION foodgram_recipe_ingredients_search_trigger()
+    RETURNS trigger AS $$
+    BEGIN
+        UPDATE foodgram_recipe
+        SET search_vector = foodgram_recipe_search_vector(id, name, text)
+        WHERE id IN (SELECT recipe_id FROM changed_rows);
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql;
+    """,
+    """
+    CREATE TRIGGER foodgram_recipe_ingredients_search_insert
+    AFTER INSERT ON foodgram_recipe_ingredients
+    REFERENCING NEW TABLE AS changed_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION foodgram_recipe_ingredients_search_trigger();
+    """,
+    """
+    CREATE TRIGGER foodgram_recipe_ingredients_search_delete
+    AFTER DELETE ON foodgram_recipe_ingredients
+    REFERENCING OLD TABLE AS changed_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION foodgram_recipe_ingredients_search_trigger();
+    """,
+    """
+    CREATE OR REPLACE FUNCTION foodgram_ingredient_search_trigger()
+    RETURNS trigger AS $$
+    BEGIN
+        UPDATE foodgram_recipe
+        SET search_vector = foodgram_recipe_search_vector(id, name, text)
+        WHERE id IN (
+            SELECT recipe_ingredients.recipe_id
+            FROM foodgram_recipe_ingredients recipe_ingredients
+            JOIN foodgram_recipeingredient recipe_ingredient
+                ON recipe_ingredient.id
+                = recipe_ingredients.recipeingredient_id
+            WHERE recipe_ingredient.ingredient_id = NEW.id
+        );
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql;
+    """,
+    """
+    CREATE TRIGGER foodgram_ingredient_search_update
+    AFTER UPDATE OF name ON foodgram_ingredient
+    FOR EACH ROW EXECUTE FUNCTION foodgram_ingredient_search_trigger();
+    """,
+    """
+    UPDATE foodgram_recipe
+    SET search_vector = foodgram_recipe_search_vector(id, name, text);
+    """,
+    """
+    CREATE INDEX foodgram_recipe_search_vector_gin
+    ON foodgram_recipe USING gin (search_vector);
+    """,
+)
+
+BACKWARD_SQL = (
+    'DROP INDEX IF EXISTS foodgram_recipe_search_vector_gin;',
+    'DROP TRIGGER IF EXISTS foodgram_ingredient_search_update '
+    'ON foodgram_ingredient;',
+    'DROP FUNCTION IF EXISTS foodgram_ingredient_search_trigger();',
+    'DROP TRIGGER IF EXISTS foodgram_recipe_ingredients_search_delete '
+    'ON foodgram_recipe_ingredients;',
+    'DROP TRIGGER IF EXISTS foodgram_recipe_ingredients_search_insert '
+    'ON foodgram_recipe_ingredients;',
+    'DROP FUNCTION IF EXISTS foodgram_recipe_ingredients_search_trigger();',
+    'DROP TRIGGER IF EXISTS foodgram_recipe_search_update '
+    'ON foodgram_recipe;',
+    'DROP FUNCTION IF EXISTS foodgram_recipe_search_trigger();',
+    'DROP FUNCTION IF EXISTS '
+    'foodgram_recipe_search_vector(bigint, text, text);',
+)
+
+
+def run_on_postgresql(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodgram', '0021_ingredient_unique_ingredient'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.RunPython(
+            run_on_postgresql(FORWARD_SQL),
+            run_on_postgresql(BACKWARD_SQL),
+        ),
+    ]
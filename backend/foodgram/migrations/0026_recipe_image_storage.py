@@ -0,0 +1,19 @@
+# Generated by Django 4.2.2 on 2026-10-18 01:37
+
+from django.db import migrations, models
+import foodgram.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodgram', '0025_recipe_image_resized'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(storage=foodgram.storage.ContentAddressedStorage(), upload_to='foodgram/images/', verbose_name='Картинка'),
+        ),
+    ]
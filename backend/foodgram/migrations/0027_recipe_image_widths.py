@@ -0,0 +1,18 @@
+# Generated by Django 4.2.2 on 2026-10-18 02:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodgram', '0026_recipe_image_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_widths',
+            field=models.JSONField(default=dict, editable=False, verbose_name='Ширина уменьшенных копий'),
+        ),
+    ]
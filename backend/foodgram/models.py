@@ -1,8 +1,12 @@
 from colorfield.fields import ColorField
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db.models.functions import RowNumber
 from slugify import slugify
 
+from .storage import ContentAddressedStorage
+
 User = get_user_model()
 
 
@@ -21,6 +25,10 @@ class Ingredient(models.Model):
         ordering = ['-id']
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
+        constraints = [
+            models.UniqueConstraint(fields=(
+                'name', 'measurement_unit'), name='unique_ingredient'),
+        ]
 
     def __str__(self):
         return f'{self.name} - {self.measurement_unit}'
@@ -78,12 +86,43 @@ class Tag(models.Model):
         return self.name
 
 
+class RecipeQuerySet(models.QuerySet):
+    "Набор запросов для рецептов."
+
+    def with_related(self):
+        "Подгрузка автора, тегов и ингредиентов фиксированным числом запросов."
+        return self.select_related('author').prefetch_related(
+            models.Prefetch('tags', queryset=Tag.objects.all()),
+            models.Prefetch(
+                'ingredients',
+                queryset=RecipeIngredient.objects.select_related('ingredient')
+            ),
+        )
+
+    def limited_per_author(self, limit=None):
+        "Не более limit последних рецептов каждого автора одним запросом."
+        queryset = self.annotate(
+            author_row=models.Window(
+                expression=RowNumber(),
+                partition_by=models.F('author'),
+                order_by=models.F('pub_date').desc(),
+            )
+        )
+        if limit is not None:
+            queryset = queryset.filter(author_row__lte=limit)
+        return queryset.order_by('author', 'author_row')
+
+
 class Recipe(models.Model):
     "Класс рецептов."
     pub_date = models.DateTimeField(
         auto_now_add=True,
         verbose_name='Дата публикации'
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения'
+    )
     author = models.ForeignKey(
         User, related_name='recipe',
         on_delete=models.CASCADE,
@@ -95,8 +134,19 @@ class Recipe(models.Model):
     )
     image = models.ImageField(
         upload_to='foodgram/images/',
+        storage=ContentAddressedStorage(),
         verbose_name='Картинка'
     )
+    image_widths = models.JSONField(
+        'Ширина уменьшенных копий',
+        default=dict,
+        editable=False,
+    )
+    image_resized = models.BooleanField(
+        default=False,
+        editable=False,
+        verbose_name='Уменьшенные копии готовы'
+    )
     text = models.TextField(
         max_length=200,
         verbose_name='Описание'
@@ -112,11 +162,22 @@ class Recipe(models.Model):
     cooking_time = models.PositiveIntegerField(
         verbose_name='Время приготовления в минутах'
     )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        verbose_name='Поисковый вектор'
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         ordering = ['-pub_date']
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = [
+            models.Index(
+                fields=('-pub_date', '-id'), name='recipe_pub_date_id_idx'),
+        ]
 
     def __str__(self):
         return f'{self.name}'
@@ -197,3 +258,32 @@ class ShoppingCart(models.Model):
             models.UniqueConstraint(fields=(
                 'user', 'recipe'), name='unique_shoping'),
         ]
+
+
+class ShoppingListItem(models.Model):
+    "Суммарное количество ингредиента в списке покупок пользователя."
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='Пользователь'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_list_items',
+        verbose_name='Ингредиент'
+    )
+    amount = models.PositiveIntegerField(verbose_name='Количество')
+
+    class Meta:
+        ordering = ['-id']
+        verbose_name = 'Ингредиент списка покупок'
+        verbose_name_plural = 'Ингредиенты списков покупок'
+        constraints = [
+            models.UniqueConstraint(fields=(
+                'user', 'ingredient'), name='unique_shopping_list_item'),
+        ]
+
+    def __str__(self):
+        return f'{self.ingredient} {self.amount}'
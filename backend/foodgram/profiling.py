@@ -0,0 +1,167 @@
+import cProfile
+import json
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+
+from django.conf import settings
+
+PSTATS = '.pstats'
+SPEEDSCOPE = '.speedscope.json'
+SPEEDSCOPE_SCHEMA = 'https://www.speedscope.app/file-format-schema.json'
+PROFILE_NAME = re.compile(
+    r'^(?P<stamp>\d{8}T\d{12})_(?P<view>[\w.]+)_(?P<method>[A-Z]+)_'
+    r'(?P<status>\d{3})_(?P<duration>\d+)ms'
+    r'(?P<ext>\.pstats|\.speedscope\.json)$'
+)
+
+
+class DeterministicProfiler:
+    "cProfile всего запроса, сохраняется в формате pstats."
+    ext = PSTATS
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+
+    def start(self):
+        self.profile.enable()
+
+    def stop(self):
+        self.profile.disable()
+
+    def save(self, path, title):
+        self.profile.dump_stats(path)
+
+
+class SamplingProfiler:
+    """Статистический профилировщик: отдельный поток раз в interval
+    секунд снимает стек потока запроса. Почти не замедляет запрос,
+    сохраняется в формате speedscope."""
+    ext = SPEEDSCOPE
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.thread_id = threading.get_ident()
+        self.samples = []
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.started = time.perf_counter()
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+        self.duration = time.perf_counter() - self.started
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(
+                    (code.co_name, code.co_filename, code.co_firstlineno))
+                frame = frame.f_back
+            stack.reverse()
+            self.samples.append(stack)
+
+    def save(self, path, title):
+        frames = {}
+        samples = [
+            [frames.setdefault(frame, len(frames)) for frame in stack]
+            for stack in self.samples
+        ]
+        with open(path, 'w') as file:
+            json.dump({
+                '$schema': SPEEDSCOPE_SCHEMA,
+                'name': title,
+                'exporter': 'foodgram',
+                'shared': {'frames': [
+                    {'name': name, 'file': filename, 'line': line}
+                    for name, filename, line in frames
+                ]},
+                'profiles': [{
+                    'type': 'sampled',
+                    'name': title,
+                    'unit': 'seconds',
+                    'startValue': 0,
+                    'endValue': self.duration,
+                    'samples': samples,
+                    'weights': [self.interval] * len(samples),
+                }],
+            }, file)
+
+
+def make_profiler():
+    if settings.PROFILE_MODE == 'sampling':
+        return SamplingProfiler(settings.PROFILE_SAMPLING_INTERVAL)
+    return DeterministicProfiler()
+
+
+def profile_name(view, method, status, duration, ext):
+    stamp = datetime.now().strftime('%Y%m%dT%H%M%S%f')
+    view = re.sub(r'[^\w.]', '', view or 'unresolved') or 'unresolved'
+    return f'{stamp}_{view}_{method}_{status}_{round(duration * 1000)}ms{ext}'
+
+
+def list_profiles(directory=None):
+    "Сохраненные профили от старых к новым: (имя файла, поля имени)."
+    directory = directory or settings.PROFILE_DIR
+    if not os.path.isdir(directory):
+        return []
+    return [
+        (name, match.groupdict())
+        for name, match in (
+            (name, PROFILE_NAME.match(name))
+            for name in sorted(os.listdir(directory)))
+        if match
+    ]
+
+
+def rotate(directory, keep):
+    "Удаление самых старых профилей сверх keep."
+    profiles = list_profiles(directory)
+    for name, _ in profiles[:max(len(profiles) - keep, 0)]:
+        try:
+            os.remove(os.path.join(directory, name))
+        except FileNotFoundError:
+            pass
+
+
+def save_profile(profiler, view, method, status, duration):
+    directory = settings.PROFILE_DIR
+    os.makedirs(directory, exist_ok=True)
+    name = profile_name(view, method, status, duration, profiler.ext)
+    profiler.save(os.path.join(directory, name), f'{method} {view}')
+    rotate(directory, settings.PROFILE_KEEP)
+    return name
+
+
+def load_stats(path):
+    """Время по функциям: {(файл, строка, функция): (собственное, общее)}
+    в секундах, одинаково для pstats и speedscope."""
+    if path.endswith(PSTATS):
+        return {
+            key: (own, total)
+            for key, (_, _, own, total, _) in pstats.Stats(path).stats.items()
+        }
+    with open(path) as file:
+        data = json.load(file)
+    frames = [(frame['file'], frame['line'], frame['name'])
+              for frame in data['shared']['frames']]
+    own = defaultdict(float)
+    total = defaultdict(float)
+    for profile in data['profiles']:
+        for stack, weight in zip(profile['samples'], profile['weights']):
+            if stack:
+                own[frames[stack[-1]]] += weight
+            for index in set(stack):
+                total[frames[index]] += weight
+    return {key: (own[key], total[key]) for key in total}
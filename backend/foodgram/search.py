@@ -0,0 +1,125 @@
+import re
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.db.models.functions import Lower
+
+from . import catalog
+
+
+def unicode_lower(value):
+    return value.lower() if isinstance(value, str) else value
+
+
+class UnicodeLower(Lower):
+    """Lower, который в SQLite понижает регистр и кириллицы:
+    встроенная функция LOWER там меняет только латиницу."""
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection, function='UNICODE_LOWER', **extra_context)
+
+
+def normalize(value):
+    "Приведение названия к виду для поиска: регистр, ё/е и пробелы."
+    return re.sub(r'\s+', ' ', value.lower().replace('ё', 'е')).strip()
+
+
+def bigrams(value):
+    return {value[i:i + 2] for i in range(len(value) - 1)}
+
+
+class IngredientIndex:
+    "Поисковый индекс ингредиентов в памяти процесса."
+
+    def __init__(self, version, ingredients):
+        self.version = version
+        self.items = []
+        self.names = []
+        self.chars = defaultdict(set)
+        self.pairs = defaultdict(set)
+        for position, (pk, name, measurement_unit) in enumerate(ingredients):
+            normalized = normalize(name)
+            self.items.append({
+                'id': pk, 'name': name, 'measurement_unit': measurement_unit
+            })
+            self.names.append(normalized)
+            for char in set(normalized):
+                self.chars[char].add(position)
+            for pair in bigrams(normalized):
+                self.pairs[pair].add(position)
+        self.sorted_positions = sorted(
+            range(len(self.names)), key=self.names.__getitem__)
+        self.sorted_names = [
+            self.names[position] for position in self.sorted_positions]
+
+    def prefix_matches(self, query):
+        start = bisect_left(self.sorted_names, query)
+        for index in range(start, len(self.sorted_names)):
+            if not self.sorted_names[index].startswith(query):
+                break
+            yield self.sorted_positions[index]
+
+    def substring_candidates(self, query):
+        if len(query) == 1:
+            return self.chars.get(query, set())
+        buckets = sorted(
+            (self.pairs.get(pair, set()) for pair in bigrams(query)),
+            key=len
+        )
+        return set.intersection(*buckets)
+
+    def search(self, query='', limit=None):
+        """Ингредиенты, подходящие под запрос.
+        Сначала совпадения с начала названия, потом с начала слова,
+        потом по подстроке."""
+        query = normalize(query)
+        if not query:
+            return self.items[:limit]
+        found = list(self.prefix_matches(query))
+        if limit is None or len(found) < limit:
+            seen = set(found)
+            word_matches = []
+            other_matches = []
+            for position in self.substring_candidates(query):
+                name = self.names[position]
+                if position in seen or query not in name:
+                    continue
+                if (' ' + name).find(' ' + query) != -1:
+                    word_matches.append(position)
+                else:
+                    other_matches.append(position)
+            found.extend(sorted(word_matches, key=self.names.__getitem__))
+            found.extend(sorted(other_matches, key=self.names.__getitem__))
+        return [self.items[position] for position in found[:limit]]
+
+
+index_lock = threading.Lock()
+ingredient_index = None
+
+
+def get_ingredient_index():
+    """Актуальный индекс ингредиентов.
+    Строится по справочнику ингредиентов и перестраивается
+    вместе с ним."""
+    global ingredient_index
+    snapshot = catalog.ingredients.get_snapshot()
+    index = ingredient_index
+    if index is None or index.version != snapshot.version:
+        with index_lock:
+            index = ingredient_index
+            if index is None or index.version != snapshot.version:
+                index = IngredientIndex(
+                    snapshot.version,
+                    ((ingredient.id, ingredient.name,
+                      ingredient.measurement_unit)
+                     for ingredient in snapshot.objects)
+                )
+                ingredient_index = index
+    return index
+
+
+def search_ingredients(query='', limit=None):
+    "Поиск ингредиентов по индексу без обращения к базе данных."
+    return get_ingredient_index().search(query, limit)
@@ -1,10 +1,16 @@
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.db import transaction
 from rest_framework import serializers
 
-from .fields import Base64ImageField, Hex2NameColor
-from .models import (Favorite, Follow, Ingredient, Recipe,
-                     RecipeIngredient, ShoppingCart, Tag)
+from . import catalog
+from .fields import (Base64ImageField, CatalogRelatedField, Hex2NameColor,
+                     same_image)
+from .images import WEBP, card_image_url, image_srcset
+from .models import Follow, Ingredient, Recipe, RecipeIngredient, Tag
 from users.models import CustomUser
-from .utils import is_subscribed
+from .user_sets import CART, FAVORITES
+from .utils import get_recipes_limit, in_user_set, is_subscribed
 
 
 class UserGETSerializer(serializers.ModelSerializer):
@@ -47,7 +53,8 @@ class IngredientSerializer(serializers.ModelSerializer):
 
 class RecipeIngredientSerializer(serializers.ModelSerializer):
     """Сериализатор для модели RecipeIngredient."""
-    id = serializers.SlugRelatedField(
+    id = CatalogRelatedField(
+        catalog=catalog.ingredients,
         many=False,
         slug_field='id',
         source='ingredient',
@@ -83,50 +90,81 @@ class TagSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'color', 'slug')
 
 
-class RecipeFollowSerializer(serializers.ModelSerializer):
+class ImageVariantsMixin:
+    "srcset по уменьшенным копиям изображения рецепта."
+
+    def get_image_srcset(self, obj):
+        return image_srcset(self.context.get('request'), obj)
+
+    def get_image_webp_srcset(self, obj):
+        return image_srcset(self.context.get('request'), obj, WEBP)
+
+
+class RecipeFollowSerializer(ImageVariantsMixin, serializers.ModelSerializer):
     """Сериализатор для объектов класса Recipe для выдачи в Подписках."""
-    image = Base64ImageField()
+    image = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
+    image_webp_srcset = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_srcset', 'image_webp_srcset',
+                  'cooking_time')
+
+    def get_image(self, obj):
+        return card_image_url(self.context.get('request'), obj)
+
+
+class RecipeIdsSerializer(serializers.Serializer):
+    """Список id рецептов для добавления в избранное или корзину
+    и удаления из них одним запросом."""
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.RECIPE_BULK_MAX,
+        error_messages={
+            'max_length': 'Не больше {max_length} рецептов за раз.'},
+    )
 
 
-class RecipeGETSerializer(serializers.ModelSerializer):
-    """Сериализатор для объектов класса Recipe для обработки GET-запросов."""
+class RecipeGETSerializer(ImageVariantsMixin, serializers.ModelSerializer):
+    """Сериализатор для объектов класса Recipe для обработки GET-запросов.
+    В списке рецептов вместо оригинала отдается копия для карточки."""
     tags = TagSerializer(many=True, read_only=True)
     ingredients = RecipeIngredientSerializer(many=True, read_only=True)
     author = UserGETSerializer(read_only=True)
     image = Base64ImageField()
+    image_srcset = serializers.SerializerMethodField()
+    image_webp_srcset = serializers.SerializerMethodField()
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
         fields = ('id', 'name', 'text', 'author',
-                  'image', 'tags', 'cooking_time',
+                  'image', 'image_srcset', 'image_webp_srcset',
+                  'tags', 'cooking_time',
                   'ingredients', 'is_favorited', 'is_in_shopping_cart')
 
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if isinstance(self.parent, serializers.ListSerializer):
+            data['image'] = card_image_url(
+                self.context.get('request'), instance)
+        return data
+
     def get_is_favorited(self, obj):
-        try:
-            user = self.context.get('request').user
-            return Favorite.objects.filter(recipe=obj.id, user=user).exists()
-        except TypeError:
-            return False
+        return in_user_set(self, FAVORITES, obj.id)
 
     def get_is_in_shopping_cart(self, obj):
-        try:
-            user = self.context.get('request').user
-            return ShoppingCart.objects.filter(
-                recipe=obj.id, user=user).exists()
-        except TypeError:
-            return False
+        return in_user_set(self, CART, obj.id)
 
 
 class RecipePOSTSerializer(serializers.ModelSerializer):
     """Сериализатор для объектов класса Recipe
     для обработки небезопасных запросов."""
-    tags = serializers.SlugRelatedField(
+    tags = CatalogRelatedField(
+        catalog=catalog.tags,
         many=True,
         slug_field='id',
         queryset=Tag.objects.all()
@@ -140,22 +178,70 @@ class RecipePOSTSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Recipe
-        exclude = ('pub_date', )
-
-    def get_or_create_ingredients(self, ingredients_list, recipe):
-        ingredient_list = []
-        for recipe_ingredient in ingredients_list:
-            amount = recipe_ingredient.get('amount')
-            ingredient = recipe_ingredient.get('ingredient')
-            RecipeIngredient.objects.get_or_create(
-                ingredient=ingredient,
-                amount=amount,
+        exclude = ('pub_date', 'updated_at', 'search_vector',
+                   'image_resized', 'image_widths')
+
+    def get_or_create_ingredients(self, lines):
+        """Строки ингредиентов (ингредиент, количество) одним запросом
+        и одной массовой вставкой недостающих."""
+        existing = {}
+        for recipe_ingredient in RecipeIngredient.objects.filter(
+            ingredient_id__in={ingredient for ingredient, _ in lines},
+            amount__in={amount for _, amount in lines},
+        ):
+            existing.setdefault(
+                (recipe_ingredient.ingredient_id, recipe_ingredient.amount),
+                recipe_ingredient
             )
-            ingredient_list.append(RecipeIngredient.objects.get(
-                ingredient=ingredient,
-                amount=amount))
-        recipe.ingredients.set(ingredient_list)
-
+        created = RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(ingredient_id=ingredient, amount=amount)
+            for ingredient, amount in lines
+            if (ingredient, amount) not in existing
+        )
+        return [existing[line] for line in lines if line in existing] + created
+
+    def ingredient_lines(self, ingredients_list):
+        return {
+            (recipe_ingredient['ingredient'].id, recipe_ingredient['amount'])
+            for recipe_ingredient in ingredients_list
+        }
+
+    def update_ingredients(self, recipe, ingredients_list):
+        "Добавление и удаление только изменившихся строк ингредиентов."
+        lines = self.ingredient_lines(ingredients_list)
+        current = {
+            (recipe_ingredient.ingredient_id, recipe_ingredient.amount):
+            recipe_ingredient.id
+            for recipe_ingredient in recipe.ingredients.all()
+        }
+        removed = [pk for line, pk in current.items() if line not in lines]
+        if removed:
+            recipe.ingredients.remove(*removed)
+        added = lines - current.keys()
+        if added:
+            recipe.ingredients.add(*self.get_or_create_ingredients(added))
+        return bool(removed or added)
+
+    def update_tags(self, recipe, tags):
+        "Добавление и удаление только изменившихся тегов."
+        tags = {tag.id for tag in tags}
+        current = {tag.id for tag in recipe.tags.all()}
+        if current - tags:
+            recipe.tags.remove(*(current - tags))
+        if tags - current:
+            recipe.tags.add(*(tags - current))
+        return tags != current
+
+    def save(self, **kwargs):
+        try:
+            return super().save(**kwargs)
+        finally:
+            image = self.validated_data.get('image')
+            if isinstance(image, UploadedFile):
+                # Хранилище перемещает временный файл, закрываем его сами.
+                image.close()
+
+    @transaction.atomic
     def create(self, validated_data):
         if 'ingredients' not in self.initial_data:
             recipe = Recipe.objects.create(**validated_data)
@@ -163,28 +249,43 @@ class RecipePOSTSerializer(serializers.ModelSerializer):
         ingredients_list = validated_data.pop('ingredients')
         tags = validated_data.pop("tags")
         recipe = Recipe.objects.create(**validated_data)
-        self.get_or_create_ingredients(ingredients_list, recipe)
+        recipe.ingredients.set(self.get_or_create_ingredients(
+            self.ingredient_lines(ingredients_list)))
         recipe.tags.set(tags)
-        recipe.save()
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        ingredients_list = validated_data.pop('ingredients')
-        tags = validated_data.pop("tags")
-        Recipe.objects.filter(name=instance).update(**validated_data)
-        instance.tags.clear()
-        instance.ingredients.clear()
-        self.get_or_create_ingredients(ingredients_list, instance)
-        instance.tags.set(tags)
+        ingredients_list = validated_data.pop('ingredients', None)
+        tags = validated_data.pop('tags', None)
+        image = validated_data.pop('image', None)
+        changed = [
+            field for field, value in validated_data.items()
+            if getattr(instance, field) != value
+        ]
+        for field in changed:
+            setattr(instance, field, validated_data[field])
+        if image is not None and not same_image(instance.image, image):
+            instance.image = image
+            changed += ['image', 'image_resized', 'image_widths']
+        relations_changed = False
+        if tags is not None:
+            relations_changed |= self.update_tags(instance, tags)
+        if ingredients_list is not None:
+            relations_changed |= self.update_ingredients(
+                instance, ingredients_list)
+        if changed or relations_changed:
+            instance.save(update_fields=changed + ['updated_at'])
         return instance
 
     def to_representation(self, instance):
+        instance = Recipe.objects.with_related().get(pk=instance.pk)
         serializer = RecipeGETSerializer(instance, context=self.context)
         return serializer.data
 
     def validate(self, data):
         ingredient_list = []
-        list_of_ingredients = data.get('ingredients')
+        list_of_ingredients = data.get('ingredients', [])
         for ingredient_to_recipe in list_of_ingredients:
             valid_ingredient = ingredient_to_recipe.get('ingredient')
             if valid_ingredient in ingredient_list:
@@ -236,40 +337,17 @@ class FollowSerializer(serializers.ModelSerializer):
                   'last_name', 'is_subscribed', 'recipes', 'recipes_count')
 
     def get_recipes(self, obj):
-        recipes_limit = self.context.get(
-            'request').query_params.get('recipes_limit')
-        if recipes_limit:
-            recipes = Recipe.objects.filter(
-                author=obj.author)[:int(recipes_limit)]
+        previews = self.context.get('recipes_previews')
+        if previews is not None:
+            recipes = previews.get(obj.author_id, [])
         else:
+            recipes_limit = get_recipes_limit(self.context.get('request'))
             recipes = Recipe.objects.filter(author=obj.author)
+            if recipes_limit is not None:
+                recipes = recipes[:recipes_limit]
         return RecipeFollowSerializer(recipes, many=True).data
 
     def get_recipes_count(self, obj):
+        if hasattr(obj, 'recipes_count'):
+            return obj.recipes_count
         return Recipe.objects.filter(author=obj.author).count()
-
-
-class FavoriteSerializer(serializers.ModelSerializer):
-    """Сериализатор для модели Favorite."""
-    user = serializers.SlugRelatedField(
-        slug_field='username',
-        read_only=True
-    )
-    recipe = RecipeGETSerializer(read_only=True)
-
-    class Meta:
-        model = Favorite
-        fields = ('user', 'recipe')
-
-
-class ShoppingCartSerializer(serializers.ModelSerializer):
-    """Сериализатор для модели ShoppingCart."""
-    user = serializers.SlugRelatedField(
-        slug_field='username',
-        read_only=True
-    )
-    recipe = RecipeGETSerializer(read_only=True)
-
-    class Meta:
-        model = ShoppingCart
-        fields = ('user', 'recipe')
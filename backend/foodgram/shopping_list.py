@@ -0,0 +1,59 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Sum
+
+from .models import ShoppingCart, ShoppingListItem
+
+User = get_user_model()
+
+
+def live_totals(user_ids=None, ingredient_ids=None):
+    "Суммы ингредиентов по корзинам, посчитанные по исходным таблицам."
+    lookups = {'recipe__ingredients__isnull': False}
+    if user_ids is not None:
+        lookups['user_id__in'] = user_ids
+    if ingredient_ids is not None:
+        lookups['recipe__ingredients__ingredient_id__in'] = ingredient_ids
+    return ShoppingCart.objects.filter(**lookups).order_by().values_list(
+        'user_id', 'recipe__ingredients__ingredient_id').annotate(
+            amount=Sum('recipe__ingredients__amount'))
+
+
+def refresh_shopping_list(user_ids, ingredient_ids=None):
+    """Пересчет списков покупок пользователей.
+    Пересчитываются только строки затронутых ингредиентов."""
+    user_ids = set(user_ids)
+    if not user_ids or (ingredient_ids is not None and not ingredient_ids):
+        return
+    with transaction.atomic():
+        list(User.objects.select_for_update().filter(
+            id__in=user_ids).order_by('id').values_list('id'))
+        items = ShoppingListItem.objects.filter(user_id__in=user_ids)
+        if ingredient_ids is not None:
+            items = items.filter(ingredient_id__in=ingredient_ids)
+        items.delete()
+        ShoppingListItem.objects.bulk_create(
+            ShoppingListItem(
+                user_id=user_id, ingredient_id=ingredient_id, amount=amount)
+            for user_id, ingredient_id, amount
+            in live_totals(user_ids, ingredient_ids)
+        )
+
+
+def diff_shopping_lists():
+    """Расхождения таблицы списков покупок с исходными таблицами.
+    Возвращает словарь (пользователь, ингредиент): (в таблице, ожидается)."""
+    stored = {
+        (user_id, ingredient_id): amount
+        for user_id, ingredient_id, amount
+        in ShoppingListItem.objects.values_list(
+            'user_id', 'ingredient_id', 'amount').iterator()
+    }
+    diff = {}
+    for user_id, ingredient_id, amount in live_totals().iterator():
+        current = stored.pop((user_id, ingredient_id), None)
+        if current != amount:
+            diff[user_id, ingredient_id] = (current, amount)
+    for key, amount in stored.items():
+        diff[key] = (amount, None)
+    return diff
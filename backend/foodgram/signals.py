@@ -0,0 +1,144 @@
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete, pre_save)
+from django.dispatch import receiver
+
+from .catalog import catalog_changed
+from .exporters import bump_cart_version
+from .images import schedule_resize
+from .links import links_changed
+from .models import Favorite, Follow, Ingredient, Recipe, ShoppingCart, Tag
+from .search import unicode_lower
+from .shopping_list import refresh_shopping_list
+from .user_sets import SET_NAMES, SOURCES, update_user_set
+
+
+def recipe_ingredient_ids(*recipe_ids):
+    return set(Recipe.ingredients.through.objects.filter(
+        recipe_id__in=recipe_ids).values_list(
+            'recipeingredient__ingredient_id', flat=True))
+
+
+def shopping_lists_changed(user_ids, ingredient_ids):
+    """Пересчет списков покупок, а сброс их кеша только после фиксации:
+    иначе выгрузка, прочитавшая старые строки до фиксации,
+    закеширует их уже под новой версией."""
+    refresh_shopping_list(user_ids, ingredient_ids)
+    transaction.on_commit(lambda: bump_cart_version(*user_ids))
+
+
+@receiver(post_save, sender=ShoppingCart)
+def shopping_cart_added(sender, instance, created, **kwargs):
+    "Пересчет списка покупок при добавлении рецепта в корзину."
+    shopping_lists_changed(
+        [instance.user_id], recipe_ingredient_ids(instance.recipe_id))
+
+
+@receiver(pre_delete, sender=ShoppingCart)
+def shopping_cart_deleting(sender, instance, **kwargs):
+    "Запоминаем ингредиенты рецепта до его удаления из корзины."
+    instance.ingredient_ids = recipe_ingredient_ids(instance.recipe_id)
+
+
+@receiver(post_delete, sender=ShoppingCart)
+def shopping_cart_deleted(sender, instance, **kwargs):
+    """Пересчет списка покупок при удалении рецепта из корзины.
+    Без pre_delete, при удалении одним запросом, ингредиенты берутся
+    из рецепта: сам рецепт при этом не удален."""
+    ingredient_ids = getattr(instance, 'ingredient_ids', None)
+    if ingredient_ids is None:
+        ingredient_ids = recipe_ingredient_ids(instance.recipe_id)
+    shopping_lists_changed([instance.user_id], ingredient_ids)
+
+
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def recipe_ingredients_changed(sender, instance, action, reverse, **kwargs):
+    "Пересчет списков покупок, в которых есть измененный рецепт."
+    if reverse:
+        return
+    if action in ('pre_add', 'pre_remove', 'pre_clear'):
+        instance.ingredient_ids = recipe_ingredient_ids(instance.pk)
+        return
+    user_ids = list(ShoppingCart.objects.filter(
+        recipe=instance).values_list('user_id', flat=True))
+    if not user_ids:
+        return
+    shopping_lists_changed(
+        user_ids,
+        instance.ingredient_ids | recipe_ingredient_ids(instance.pk)
+    )
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def ingredient_changed(sender, **kwargs):
+    "Новая версия справочника ингредиентов и его поискового индекса."
+    catalog_changed('ingredient')
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def tag_changed(sender, **kwargs):
+    "Новая версия справочника тегов."
+    catalog_changed('tag')
+
+
+def user_set_changed(sender, instance, present):
+    name = SET_NAMES[sender]
+    user = instance.user if sender.user.is_cached(instance) else None
+    update_user_set(name, user, instance.user_id,
+                    [getattr(instance, SOURCES[name][1])], present)
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_save, sender=Follow)
+def user_set_added(sender, instance, created, **kwargs):
+    "Добавление id в кешированное множество пользователя."
+    if created:
+        user_set_changed(sender, instance, True)
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+@receiver(post_delete, sender=Follow)
+def user_set_removed(sender, instance, **kwargs):
+    "Удаление id из кешированного множества пользователя."
+    user_set_changed(sender, instance, False)
+
+
+@receiver(links_changed)
+def user_set_bulk_changed(sender, user, target_ids, present, **kwargs):
+    "Изменение кешированного множества после изменения списком."
+    update_user_set(SET_NAMES[sender], user, user.id, target_ids, present)
+
+
+@receiver(links_changed, sender=ShoppingCart)
+def shopping_cart_bulk_changed(sender, user, target_ids, **kwargs):
+    "Один пересчет списка покупок на весь список рецептов."
+    shopping_lists_changed([user.id], recipe_ingredient_ids(*target_ids))
+
+
+@receiver(pre_save, sender=Recipe)
+def recipe_image_uploading(sender, instance, **kwargs):
+    "Копии прежнего изображения не подходят к новому."
+    if instance.image and not instance.image._committed:
+        instance.image_resized = False
+        instance.image_widths = {}
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_image_uploaded(sender, instance, **kwargs):
+    "Уменьшенные копии изображения после фиксации транзакции."
+    if instance.image and not instance.image_resized:
+        pk, name = instance.pk, instance.image.name
+        transaction.on_commit(lambda: schedule_resize(pk, name))
+
+
+@receiver(connection_created)
+def sqlite_functions(sender, connection, **kwargs):
+    "Функции для UnicodeLower в каждом соединении с SQLite."
+    if connection.vendor == 'sqlite':
+        connection.connection.create_function(
+            'UNICODE_LOWER', 1, unicode_lower, deterministic=True)
@@ -0,0 +1,51 @@
+import hashlib
+import os
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.core.files.utils import validate_file_name
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранилище, где имя файла - это sha256 его содержимого.
+    Повторная загрузка того же файла ничего не записывает,
+    а файл по имени никогда не меняется и кешируется навсегда."""
+
+    def content_name(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        directory = os.path.dirname(name)
+        ext = os.path.splitext(name)[1].lower()
+        return os.path.join(directory, digest.hexdigest() + ext)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.content_name(name, content)
+        validate_file_name(name, allow_relative_path=True)
+        return self._save(name, content)
+
+    def save_exact(self, name, content):
+        """Сохранение под заданным именем, например для копий,
+        чьи имена производны от имени оригинала."""
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        return self._save(name, content)
+
+    def _save(self, name, content):
+        if self.exists(name):
+            # Свежее время изменения защищает файл от сборки мусора,
+            # пока ссылающийся на него рецепт еще не сохранен.
+            os.utime(self.path(name))
+            return name
+        saved = super()._save(name, content)
+        if saved != name:
+            # Тот же файл параллельно записал другой запрос.
+            self.delete(saved)
+        return name
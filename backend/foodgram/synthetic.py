@@ -0,0 +1,269 @@
+import io
+import random
+from itertools import accumulate
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from PIL import Image
+
+from .images import image_storage, make_variants
+from .models import (Favorite, Follow, Ingredient, Recipe, RecipeIngredient,
+                     ShoppingCart, ShoppingListItem, Tag)
+from .shopping_list import refresh_shopping_list
+
+User = get_user_model()
+
+PREFIX = 'synthetic_'
+PASSWORD = 'synthetic-password'
+AMOUNTS = (1, 2, 3, 5, 10, 20, 50, 100, 150, 200, 250, 300, 400, 500)
+TAGS = (
+    ('Завтрак', '#A87D32', 'breakfast'),
+    ('Обед', '#32A84A', 'lunch'),
+    ('Ужин', '#7532A8', 'dinner'),
+)
+WORDS = (
+    'пирог', 'суп', 'салат', 'запеканка', 'рагу', 'паста', 'омлет', 'каша',
+    'курица', 'говядина', 'грибы', 'сыр', 'томаты', 'картофель', 'тыква',
+)
+
+
+def power_law_weights(count, alpha):
+    "Накопленные веса Ципфа: k-й по популярности элемент весит 1 / k^alpha."
+    return list(accumulate(1 / (rank + 1) ** alpha for rank in range(count)))
+
+
+def power_law_count(rng, mean, maximum):
+    "Число связей пользователя с тяжелым хвостом и заданным средним."
+    if mean <= 0:
+        return 0
+    alpha = 2.0
+    # Среднее распределения Парето с минимумом m равно m * alpha / (alpha - 1).
+    minimum = mean * (alpha - 1) / alpha
+    return min(maximum, int(minimum * rng.paretovariate(alpha)))
+
+
+def skewed_sample(rng, population, cum_weights, count, exclude=None):
+    "До count разных элементов, популярные выбираются чаще."
+    picked = set()
+    for _ in range(5):
+        if len(picked) >= count:
+            break
+        picked.update(rng.choices(
+            population, cum_weights=cum_weights, k=(count - len(picked)) * 2))
+        picked.discard(exclude)
+    return list(picked)[:count]
+
+
+def placeholder_image():
+    "Одна картинка на все рецепты: хранилище сохранит ее один раз."
+    buffer = io.BytesIO()
+    Image.new('RGB', (1600, 1200), '#E26C2D').save(buffer, 'JPEG')
+    name = image_storage().save(
+        'foodgram/images/synthetic.jpg', ContentFile(buffer.getvalue()))
+    return name, make_variants(name)
+
+
+def batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def analyze():
+    "Свежая статистика планировщика после массовой вставки."
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+
+class DatasetGenerator:
+    """Синтетические пользователи, рецепты, подписки, избранное и корзины.
+    Авторы, рецепты и подписки выбираются по степенному закону:
+    немногие популярные получают большую часть связей."""
+
+    def __init__(self, seed=0, batch_size=2000, alpha=1.1, log=None):
+        self.rng = random.Random(seed)
+        self.batch_size = batch_size
+        self.alpha = alpha
+        self.log = log or (lambda message: None)
+
+    def tags(self):
+        tags = list(Tag.objects.all())
+        if tags:
+            return tags
+        return Tag.objects.bulk_create(
+            Tag(name=name, color=color, slug=slug)
+            for name, color, slug in TAGS)
+
+    def ingredients(self, minimum=100):
+        ingredients = list(Ingredient.objects.values_list('id', flat=True))
+        if len(ingredients) >= minimum:
+            return ingredients
+        Ingredient.objects.bulk_create(
+            (Ingredient(name=f'{PREFIX}ингредиент {number}',
+                        measurement_unit='г')
+             for number in range(minimum)),
+            ignore_conflicts=True
+        )
+        return list(Ingredient.objects.values_list('id', flat=True))
+
+    def users(self, count):
+        synthetic = User.objects.filter(username__startswith=PREFIX)
+        start = synthetic.count()
+        last_id = User.objects.order_by('-id').values_list(
+            'id', flat=True).first() or 0
+        password = make_password(PASSWORD)
+        User.objects.bulk_create(
+            (User(username=f'{PREFIX}{number}',
+                  email=f'{PREFIX}{number}@example.com',
+                  first_name='Синтетик', last_name=f'№{number}',
+                  password=password)
+             for number in range(start, start + count)),
+            batch_size=self.batch_size
+        )
+        return list(synthetic.filter(id__gt=last_id).values_list(
+            'id', flat=True))
+
+    def recipes(self, count, authors, tags, ingredients):
+        rng = self.rng
+        rng.shuffle(authors)
+        author_weights = power_law_weights(len(authors), self.alpha)
+        image, widths = placeholder_image()
+        recipe_ids = []
+        for batch in batched(range(count), self.batch_size):
+            recipes = Recipe.objects.bulk_create(
+                Recipe(author_id=author,
+                       name=' '.join(rng.sample(WORDS, 2))[:25],
+                       text=' '.join(rng.choices(WORDS, k=25))[:200],
+                       image=image,
+                       image_resized=True,
+                       image_widths=widths,
+                       cooking_time=rng.randint(5, 180))
+                for author in rng.choices(
+                    authors, cum_weights=author_weights, k=len(batch))
+            )
+            self.recipe_relations(recipes, tags, ingredients)
+            recipe_ids.extend(recipe.id for recipe in recipes)
+        return recipe_ids
+
+    def recipe_relations(self, recipes, tags, ingredients):
+        "Теги и строки ингредиентов: в среднем 7 на рецепт."
+        rng = self.rng
+        wanted = {
+            recipe.id: {
+                (ingredient, rng.choice(AMOUNTS))
+                for ingredient in rng.sample(
+                    ingredients,
+                    min(len(ingredients), round(rng.triangular(3, 15, 6))))
+            }
+            for recipe in recipes
+        }
+        pairs = set().union(*wanted.values())
+        lines = {
+            (line.ingredient_id, line.amount): line.id
+            for line in RecipeIngredient.objects.filter(
+                ingredient_id__in={ingredient for ingredient, _ in pairs})
+        }
+        created = RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(ingredient_id=ingredient, amount=amount)
+            for ingredient, amount in pairs - lines.keys()
+        )
+        lines.update(
+            ((line.ingredient_id, line.amount), line.id) for line in created)
+        Recipe.ingredients.through.objects.bulk_create(
+            Recipe.ingredients.through(
+                recipe_id=recipe_id, recipeingredient_id=lines[pair])
+            for recipe_id, recipe_pairs in wanted.items()
+            for pair in recipe_pairs
+        )
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe_id=recipe.id, tag_id=tag.id)
+            for recipe in recipes
+            for tag in rng.sample(tags, rng.randint(1, min(3, len(tags))))
+        )
+
+    def links(self, model, field, users, targets, mean, maximum, owners=None):
+        """Связи пользователей с популярными объектами: подписки,
+        избранное, корзина. Себя и свои рецепты не выбирают."""
+        rng = self.rng
+        targets = list(targets)
+        rng.shuffle(targets)
+        weights = power_law_weights(len(targets), self.alpha)
+        created = 0
+        for batch in batched(users, self.batch_size):
+            objects = [
+                model(user_id=user, **{field: target})
+                for user in batch
+                for target in skewed_sample(
+                    rng, targets, weights,
+                    power_law_count(rng, mean, maximum),
+                    exclude=user if owners is None else None)
+                if owners is None or owners.get(target) != user
+            ]
+            model.objects.bulk_create(objects, ignore_conflicts=True)
+            created += len(objects)
+        return created
+
+    @transaction.atomic
+    def generate(self, users, recipes, follows=10, favorites=20, cart=3):
+        tags = self.tags()
+        ingredients = self.ingredients()
+        user_ids = self.users(users)
+        self.log(f'users: {len(user_ids)}')
+        recipe_ids = self.recipes(recipes, list(user_ids), tags, ingredients)
+        self.log(f'recipes: {len(recipe_ids)}')
+        authors = set(Recipe.objects.filter(
+            author_id__in=user_ids).values_list('author_id', flat=True))
+        owners = dict(Recipe.objects.filter(
+            id__in=recipe_ids).values_list('id', 'author_id'))
+        summary = {
+            'users': len(user_ids),
+            'recipes': len(recipe_ids),
+            'follows': self.links(
+                Follow, 'author_id', user_ids, authors,
+                follows, len(authors)),
+            'favorites': self.links(
+                Favorite, 'recipe_id', user_ids, recipe_ids,
+                favorites, 1000, owners),
+            'cart': self.links(
+                ShoppingCart, 'recipe_id', user_ids, recipe_ids,
+                cart, 50, owners),
+        }
+        self.log(f'links: {summary}')
+        for batch in batched(sorted(set(ShoppingCart.objects.filter(
+                user_id__in=user_ids).values_list('user_id', flat=True))),
+                self.batch_size):
+            refresh_shopping_list(batch)
+        if connection.vendor == 'postgresql':
+            transaction.on_commit(analyze)
+        return summary
+
+
+def clear_dataset():
+    """Удаление синтетических пользователей вместе со всеми их данными.
+    Связи удаляются одним запросом на таблицу, без сигналов на каждую
+    строку: списки покупок этих пользователей удаляются вместе с ними."""
+    users = User.objects.filter(username__startswith=PREFIX)
+    user_ids = list(users.values_list('id', flat=True))
+    if not user_ids:
+        return 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        for model in (ShoppingListItem, ShoppingCart, Favorite, Follow):
+            cursor.execute(
+                f'DELETE FROM {model._meta.db_table} '
+                f'WHERE user_id IN (SELECT id FROM {User._meta.db_table} '
+                f'WHERE username LIKE %s)',
+                [PREFIX + '%'])
+        cursor.execute(
+            f'DELETE FROM {Follow._meta.db_table} '
+            f'WHERE author_id IN (SELECT id FROM {User._meta.db_table} '
+            f'WHERE username LIKE %s)',
+            [PREFIX + '%'])
+        users.delete()
+    return len(user_ids)
@@ -0,0 +1,506 @@
+import base64
+import io
+import json
+import shutil
+import tempfile
+from collections import namedtuple
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from django.urls.resolvers import URLResolver
+from PIL import Image
+from rest_framework.authtoken.models import Token
+
+from foodgram import urls
+from foodgram.catalog import expire_catalogs
+from foodgram.models import (Favorite, Follow, Ingredient, Recipe,
+                             ShoppingCart, Tag)
+from foodgram.shopping_list import refresh_shopping_list
+from foodgram.synthetic import (AMOUNTS, PASSWORD, DatasetGenerator,
+                                placeholder_image)
+
+User = get_user_model()
+
+Endpoint = namedtuple(
+    'Endpoint', 'name route method budget status paginated')
+
+# Бюджеты запросов к базе при холодном кеше для авторизованного
+# пользователя. Число запросов не должно зависеть ни от размера
+# страницы, ни от объема данных. Для запросов со списком рецептов
+# вместо размера страницы меняется длина списка. Бюджеты измерены
+# на PostgreSQL: на других базах часть изменений идет через ORM
+# несколькими запросами, и там проверяется только рост.
+ENDPOINTS = (
+    Endpoint('api_root', 'api-root', 'get', 1, 200, False),
+    Endpoint('recipe_list', 'recipe-list', 'get', 8, 200, True),
+    Endpoint('recipe_list_filtered', 'recipe-list', 'get', 9, 200, True),
+    Endpoint('recipe_list_cursor', 'recipe-list', 'get', 7, 200, True),
+    Endpoint('recipe_create', 'recipe-list', 'post', 22, 201, False),
+    Endpoint('recipe_detail', 'recipe-detail', 'get', 8, 200, False),
+    Endpoint('recipe_update', 'recipe-detail', 'patch', 24, 200, False),
+    Endpoint('recipe_delete', 'recipe-detail', 'delete', 11, 204, False),
+    Endpoint('favorite_add', 'recipe-favorite', 'post', 4, 201, False),
+    Endpoint('favorite_remove', 'recipe-favorite', 'delete', 4, 204, False),
+    Endpoint('cart_add', 'recipe-shopping-cart', 'post', 11, 201, False),
+    Endpoint('cart_remove', 'recipe-shopping-cart', 'delete', 11, 204,
+             False),
+    Endpoint('favorite_bulk_add', 'recipe-favorite-bulk', 'post', 4, 200,
+             True),
+    Endpoint('favorite_bulk_remove', 'recipe-favorite-bulk', 'delete', 4,
+             200, True),
+    Endpoint('cart_bulk_add', 'recipe-shopping-cart-bulk', 'post', 11, 200,
+             True),
+    Endpoint('cart_bulk_remove', 'recipe-shopping-cart-bulk', 'delete', 11,
+             200, True),
+    Endpoint('download_shopping_cart', 'recipe-download-shopping-cart',
+             'get', 3, 200, False),
+    Endpoint('tag_list', 'tag-list', 'get', 2, 200, False),
+    Endpoint('tag_detail', 'tag-detail', 'get', 2, 200, False),
+    Endpoint('ingredient_list', 'ingredient-list', 'get', 2, 200, False),
+    Endpoint('ingredient_search', 'ingredient-list', 'get', 2, 200, False),
+    Endpoint('ingredient_detail', 'ingredient-detail', 'get', 2, 200,
+             False),
+    Endpoint('subscriptions', 'subscriptions', 'get', 4, 200, True),
+    Endpoint('subscribe', 'users-subscribe', 'post', 3, 201, False),
+    Endpoint('unsubscribe', 'users-subscribe', 'delete', 2, 204, False),
+    Endpoint('user_list', 'customuser-list', 'get', 4, 200, True),
+    Endpoint('user_create', 'customuser-list', 'post', 5, 201, False),
+    Endpoint('user_detail', 'customuser-detail', 'get', 3, 200, False),
+    Endpoint('user_me', 'customuser-me', 'get', 2, 200, False),
+    Endpoint('set_password', 'customuser-set-password', 'post', 2, 204,
+             False),
+    Endpoint('reset_password', 'customuser-reset-password', 'post', 1, 204,
+             False),
+    Endpoint('reset_password_confirm', 'customuser-reset-password-confirm',
+             'post', 0, 400, False),
+    Endpoint('set_username', 'customuser-set-username', 'post', 3, 204,
+             False),
+    Endpoint('reset_username', 'customuser-reset-username', 'post', 1, 204,
+             False),
+    Endpoint('reset_username_confirm', 'customuser-reset-username-confirm',
+             'post', 1, 400, False),
+    Endpoint('activation', 'customuser-activation', 'post', 0, 400, False),
+    Endpoint('resend_activation', 'customuser-resend-activation', 'post', 1,
+             400, False),
+    Endpoint('login', 'login', 'post', 3, 200, False),
+    Endpoint('logout', 'logout', 'post', 4, 204, False),
+)
+
+PAGE_SIZES = (1, 50)
+Call = namedtuple('Call', 'path data user')
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def api_routes(patterns=None):
+    "Имена и параметры всех маршрутов foodgram.urls."
+    for pattern in patterns if patterns is not None else urls.urlpatterns:
+        if isinstance(pattern, URLResolver):
+            yield from api_routes(pattern.url_patterns)
+        elif pattern.name:
+            yield pattern.name, tuple(pattern.pattern.regex.groupindex)
+
+
+def reachable_routes():
+    """Маршруты, до которых доходит запрос: маршрут роутера,
+    перекрытый одноименным путем djoser, не проверяется."""
+    reachable = set()
+    for name, groups in api_routes():
+        path = reverse(f'{urls.app_name}:{name}',
+                       kwargs={group: '1' for group in groups})
+        if resolve(path).url_name == name:
+            reachable.add(name)
+    return reachable
+
+
+def image_payload():
+    buffer = io.BytesIO()
+    Image.new('RGB', (32, 32), '#E26C2D').save(buffer, 'PNG')
+    return ('data:image/png;base64,'
+            + base64.b64encode(buffer.getvalue()).decode())
+
+
+def describe(title, queries):
+    return '\n'.join(
+        [title] + [f'  {query["sql"]}' for query in queries])
+
+
+class Calls:
+    """Запросы к каждому эндпоинту. Подготовка данных для запроса
+    выполняется до замера и в число запросов не входит."""
+
+    def __init__(self, subject):
+        self.subject = subject
+        self.counter = 0
+        self.image, self.image_widths = placeholder_image()
+
+    def url(self, route, **kwargs):
+        return reverse(f'{urls.app_name}:{route}', kwargs=kwargs or None)
+
+    def unique(self, prefix):
+        self.counter += 1
+        return f'{prefix}{self.counter}'
+
+    def new_user(self):
+        name = self.unique('budget_user_')
+        user = User.objects.create_user(
+            username=name, email=f'{name}@example.com', password=PASSWORD)
+        return user
+
+    def new_recipe(self):
+        return Recipe.objects.create(
+            author=self.subject, name=self.unique('Рецепт '),
+            text='Проверка бюджета запросов', image=self.image,
+            image_resized=True, image_widths=self.image_widths,
+            cooking_time=10)
+
+    def other_recipes(self, model, count=1):
+        "Чужие рецепты, которых еще нет в избранном или корзине."
+        return list(Recipe.objects.exclude(author=self.subject).exclude(
+            id__in=model.objects.filter(user=self.subject).values(
+                'recipe_id')).order_by('-id')[:count])
+
+    def other_recipe(self, model):
+        return self.other_recipes(model)[0]
+
+    def bulk(self, model, route, count, present):
+        """Список из count + 1 рецептов: при добавлении один уже
+        в избранном или корзине, при удалении одного там нет."""
+        recipes = self.other_recipes(model, count + 1)
+        recipes += [self.new_recipe()
+                    for _ in range(count + 1 - len(recipes))]
+        model.objects.bulk_create(
+            model(user=self.subject, recipe=recipe)
+            for recipe in (recipes[:1] if present else recipes[1:]))
+        if model is ShoppingCart:
+            refresh_shopping_list([self.subject.id])
+        return Call(self.url(route),
+                    {'recipes': [recipe.id for recipe in recipes]},
+                    self.subject)
+
+    def recipe_data(self):
+        "Каждый раз новые количества: строки ингредиентов всегда создаются."
+        ingredients = Ingredient.objects.order_by('id')[:3]
+        return {
+            'name': self.unique('Рецепт '),
+            'text': 'Проверка бюджета запросов',
+            'cooking_time': self.counter,
+            'image': image_payload(),
+            'tags': list(Tag.objects.values_list('id', flat=True)),
+            'ingredients': [
+                {'id': ingredient.id, 'amount': max(AMOUNTS) + self.counter}
+                for ingredient in ingredients
+            ],
+        }
+
+    def api_root(self, page_size):
+        return Call(self.url('api-root'), None, self.subject)
+
+    def recipe_list(self, page_size):
+        return Call(f'{self.url("recipe-list")}?page=2&limit={page_size}',
+                    None, self.subject)
+
+    def recipe_list_filtered(self, page_size):
+        tags = '&'.join(
+            f'tags={slug}' for slug in Tag.objects.values_list(
+                'slug', flat=True))
+        return Call(f'{self.url("recipe-list")}?limit={page_size}'
+                    f'&is_favorited=1&{tags}', None, self.subject)
+
+    def recipe_list_cursor(self, page_size):
+        recipe = Recipe.objects.order_by('-pub_date', '-id')[page_size]
+        cursor = json.dumps({
+            'p': [recipe.pub_date.isoformat(), recipe.id], 'r': False})
+        cursor = base64.urlsafe_b64encode(cursor.encode()).decode()
+        return Call(f'{self.url("recipe-list")}?limit={page_size}'
+                    f'&cursor={cursor}', None, self.subject)
+
+    def recipe_create(self, page_size):
+        return Call(self.url('recipe-list'), self.recipe_data(), self.subject)
+
+    def recipe_detail(self, page_size):
+        recipe = Recipe.objects.exclude(author=self.subject).first()
+        return Call(self.url('recipe-detail', pk=recipe.id), None,
+                    self.subject)
+
+    def recipe_update(self, page_size):
+        recipe = Recipe.objects.filter(author=self.subject).first()
+        data = self.recipe_data()
+        del data['image']
+        return Call(self.url('recipe-detail', pk=recipe.id), data,
+                    self.subject)
+
+    def recipe_delete(self, page_size):
+        return Call(self.url('recipe-detail', pk=self.new_recipe().id),
+                    None, self.subject)
+
+    def favorite_add(self, page_size):
+        recipe = self.other_recipe(Favorite)
+        return Call(self.url('recipe-favorite', pk=recipe.id), None,
+                    self.subject)
+
+    def favorite_remove(self, page_size):
+        recipe = self.other_recipe(Favorite)
+        Favorite.objects.create(user=self.subject, recipe=recipe)
+        return Call(self.url('recipe-favorite', pk=recipe.id), None,
+                    self.subject)
+
+    def cart_add(self, page_size):
+        recipe = self.other_recipe(ShoppingCart)
+        return Call(self.url('recipe-shopping-cart', pk=recipe.id), None,
+                    self.subject)
+
+    def cart_remove(self, page_size):
+        recipe = self.other_recipe(ShoppingCart)
+        ShoppingCart.objects.create(user=self.subject, recipe=recipe)
+        return Call(self.url('recipe-shopping-cart', pk=recipe.id), None,
+                    self.subject)
+
+    def favorite_bulk_add(self, page_size):
+        return self.bulk(Favorite, 'recipe-favorite-bulk', page_size, True)
+
+    def favorite_bulk_remove(self, page_size):
+        return self.bulk(Favorite, 'recipe-favorite-bulk', page_size, False)
+
+    def cart_bulk_add(self, page_size):
+        return self.bulk(
+            ShoppingCart, 'recipe-shopping-cart-bulk', page_size, True)
+
+    def cart_bulk_remove(self, page_size):
+        return self.bulk(
+            ShoppingCart, 'recipe-shopping-cart-bulk', page_size, False)
+
+    def download_shopping_cart(self, page_size):
+        return Call(self.url('recipe-download-shopping-cart') + '?format=csv',
+                    None, self.subject)
+
+    def tag_list(self, page_size):
+        return Call(self.url('tag-list'), None, self.subject)
+
+    def tag_detail(self, page_size):
+        return Call(self.url('tag-detail', pk=Tag.objects.first().id), None,
+                    self.subject)
+
+    def ingredient_list(self, page_size):
+        return Call(self.url('ingredient-list'), None, self.subject)
+
+    def ingredient_search(self, page_size):
+        name = Ingredient.objects.order_by('id').first().name[:2]
+        return Call(f'{self.url("ingredient-list")}?name={name}', None,
+                    self.subject)
+
+    def ingredient_detail(self, page_size):
+        return Call(
+            self.url('ingredient-detail', pk=Ingredient.objects.first().id),
+            None, self.subject)
+
+    def subscriptions(self, page_size):
+        return Call(f'{self.url("subscriptions")}?limit={page_size}'
+                    f'&recipes_limit=3', None, self.subject)
+
+    def subscribe(self, page_size):
+        author = Recipe.objects.exclude(author=self.subject).exclude(
+            author__in=Follow.objects.filter(user=self.subject).values(
+                'author_id')).values_list('author_id', flat=True).first()
+        if author is None:
+            author = self.new_user().id
+        return Call(self.url('users-subscribe', pk=author), None,
+                    self.subject)
+
+    def unsubscribe(self, page_size):
+        author = self.new_user()
+        Follow.objects.create(user=self.subject, author=author)
+        return Call(self.url('users-subscribe', pk=author.id), None,
+                    self.subject)
+
+    def user_list(self, page_size):
+        return Call(f'{self.url("customuser-list")}?limit={page_size}', None,
+                    self.subject)
+
+    def user_create(self, page_size):
+        name = self.unique('budget_new_')
+        return Call(self.url('customuser-list'), {
+            'username': name, 'email': f'{name}@example.com',
+            'first_name': 'Бюджет', 'last_name': 'Запросов',
+            'password': PASSWORD,
+        }, None)
+
+    def user_detail(self, page_size):
+        author = Follow.objects.filter(user=self.subject).first().author_id
+        return Call(self.url('customuser-detail', id=author), None,
+                    self.subject)
+
+    def user_me(self, page_size):
+        return Call(self.url('customuser-me'), None, self.subject)
+
+    def set_password(self, page_size):
+        return Call(self.url('customuser-set-password'), {
+            'current_password': PASSWORD, 'new_password': PASSWORD,
+        }, self.subject)
+
+    def reset_password(self, page_size):
+        return Call(self.url('customuser-reset-password'),
+                    {'email': self.subject.email}, None)
+
+    def reset_password_confirm(self, page_size):
+        return Call(self.url('customuser-reset-password-confirm'), {
+            'uid': 'invalid', 'token': 'invalid', 'new_password': PASSWORD,
+        }, None)
+
+    def set_username(self, page_size):
+        user = self.new_user()
+        return Call(self.url('customuser-set-username'), {
+            'current_password': PASSWORD,
+            'new_email': f'{self.unique("renamed_")}@example.com',
+        }, user)
+
+    def reset_username(self, page_size):
+        return Call(self.url('customuser-reset-username'),
+                    {'email': self.subject.email}, None)
+
+    def reset_username_confirm(self, page_size):
+        return Call(self.url('customuser-reset-username-confirm'), {
+            'uid': 'invalid', 'token': 'invalid',
+            'new_email': 'invalid@example.com',
+        }, None)
+
+    def activation(self, page_size):
+        return Call(self.url('customuser-activation'),
+                    {'uid': 'invalid', 'token': 'invalid'}, None)
+
+    def resend_activation(self, page_size):
+        return Call(self.url('customuser-resend-activation'),
+                    {'email': self.subject.email}, None)
+
+    def login(self, page_size):
+        return Call(self.url('login'), {
+            'email': self.subject.email, 'password': PASSWORD,
+        }, None)
+
+    def logout(self, page_size):
+        return Call(self.url('logout'), None, self.new_user())
+
+
+@override_settings(
+    CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    MEDIA_ROOT=MEDIA_ROOT,
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+    RECIPE_IMAGE_ASYNC=False,
+)
+class QueryBudgetTest(TransactionTestCase):
+    """Число SQL-запросов каждого эндпоинта на двух объемах данных:
+    не больше бюджета и не растет ни с размером страницы, ни с данными.
+    Запросы выполняются без общей транзакции теста, как в работе:
+    действия после фиксации тоже попадают в счет."""
+    sizes = (200, 2000)
+    seed = 0
+    endpoints = ENDPOINTS
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def test_every_route_has_budget(self):
+        uncovered = reachable_routes() - {
+            endpoint.route for endpoint in ENDPOINTS}
+        self.assertFalse(
+            uncovered,
+            'Нет бюджета для маршрутов: ' + ', '.join(sorted(uncovered)))
+
+    def test_budgets(self):
+        results = self.measure_endpoints()
+        for endpoint in self.endpoints:
+            with self.subTest(endpoint.name):
+                failures = self.check_endpoint(
+                    endpoint, results[endpoint.name])
+                if failures:
+                    self.fail('\n'.join(failures))
+
+    def prepare_subject(self, subject, recipes):
+        """Связи проверяемого пользователя растут вместе с данными:
+        подписки, избранное и корзина с самыми новыми рецептами."""
+        others = Recipe.objects.exclude(author=subject).order_by('-id')
+        authors = others.order_by().values_list(
+            'author_id', flat=True).distinct()[:max(recipes // 50, 5)]
+        Follow.objects.bulk_create(
+            (Follow(user=subject, author_id=author) for author in authors),
+            ignore_conflicts=True)
+        Favorite.objects.bulk_create(
+            (Favorite(user=subject, recipe_id=recipe) for recipe in
+             others.values_list('id', flat=True)[:recipes // 10]),
+            ignore_conflicts=True)
+        ShoppingCart.objects.bulk_create(
+            (ShoppingCart(user=subject, recipe_id=recipe) for recipe in
+             others.values_list('id', flat=True)[:min(recipes // 20, 100)]),
+            ignore_conflicts=True)
+        refresh_shopping_list([subject.id])
+
+    def measure(self, client, endpoint, call):
+        cache.clear()
+        expire_catalogs()
+        headers = {}
+        if call.user is not None:
+            token, _ = Token.objects.get_or_create(user=call.user)
+            headers['HTTP_AUTHORIZATION'] = f'Token {token.key}'
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(client, endpoint.method)(
+                call.path, call.data, content_type='application/json',
+                **headers)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        return response, queries.captured_queries
+
+    def measure_endpoints(self):
+        generator = DatasetGenerator(seed=self.seed)
+        subject = User.objects.create_user(
+            username='budget', email='budget@example.com', password=PASSWORD,
+            first_name='Бюджет', last_name='Запросов')
+        client = Client(raise_request_exception=False)
+        calls = Calls(subject)
+        calls.new_recipe()
+        results = {endpoint.name: [] for endpoint in self.endpoints}
+        created = 0
+        for size in self.sizes:
+            generator.generate(
+                users=max((size - created) // 10, 1),
+                recipes=size - created)
+            created = size
+            self.prepare_subject(subject, size)
+            for endpoint in self.endpoints:
+                page_sizes = PAGE_SIZES if endpoint.paginated else (None,)
+                for page_size in page_sizes:
+                    call = getattr(calls, endpoint.name)(page_size)
+                    response, queries = self.measure(client, endpoint, call)
+                    label = f'{size} recipes'
+                    if page_size is not None:
+                        label += f', limit={page_size}'
+                    results[endpoint.name].append(
+                        (label, response, queries))
+        return results
+
+    def check_endpoint(self, endpoint, results):
+        "Ошибки эндпоинта: неверный статус или лишние запросы с их SQL."
+        failures = []
+        counts = []
+        for label, response, queries in results:
+            counts.append(len(queries))
+            title = f'{endpoint.name} {endpoint.method.upper()} ({label})'
+            if response.status_code != endpoint.status:
+                failures.append(
+                    f'{title}: статус {response.status_code} вместо '
+                    f'{endpoint.status}: {response.content[:300]!r}')
+            elif (connection.vendor == 'postgresql'
+                  and len(queries) > endpoint.budget):
+                failures.append(describe(
+                    f'{title}: {len(queries)} запросов при бюджете '
+                    f'{endpoint.budget}', queries))
+            elif len(queries) > counts[0]:
+                failures.append(describe(
+                    f'{title}: {len(queries)} запросов, а на меньших '
+                    f'данных {counts[0]}', queries))
+        return failures
@@ -0,0 +1,48 @@
+import io
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from foodgram.images import (image_srcset, image_storage,
+                             resize_recipe_image, variant_name)
+from foodgram.models import Recipe
+
+User = get_user_model()
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(),
+                   RECIPE_IMAGE_WIDTHS={'card': 480, 'detail': 1200})
+class ImageSrcsetTest(TestCase):
+    "В srcset настоящая ширина копий: маленькие изображения не растягиваются."
+
+    def recipe(self, width):
+        buffer = io.BytesIO()
+        Image.new('RGB', (width, width // 2), '#E26C2D').save(buffer, 'PNG')
+        name = image_storage().save(
+            f'foodgram/images/{width}.png', ContentFile(buffer.getvalue()))
+        author = User.objects.create(
+            username=f'author{width}', email=f'author{width}@example.com')
+        recipe = Recipe.objects.create(
+            author=author, name='Рецепт', text='Текст', image=name,
+            cooking_time=10)
+        self.assertTrue(resize_recipe_image(recipe.id, name))
+        recipe.refresh_from_db()
+        return recipe
+
+    def assertSrcset(self, width, expected, ext=None):
+        recipe = self.recipe(width)
+        self.assertEqual(image_srcset(None, recipe, ext), ', '.join(
+            image_storage().url(variant_name(recipe.image.name, variant, ext))
+            + f' {real_width}w' for variant, real_width in expected))
+
+    def test_small_image(self):
+        self.assertSrcset(300, [(480, 300)])
+
+    def test_medium_image(self):
+        self.assertSrcset(800, [(480, 480), (1200, 800)], 'webp')
+
+    def test_large_image(self):
+        self.assertSrcset(1600, [(480, 480), (1200, 1200)])
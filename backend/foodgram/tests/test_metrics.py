@@ -0,0 +1,28 @@
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+
+@override_settings(METRICS=True, METRICS_TOKEN='', METRICS_ALLOWED_IPS=[])
+class MetricsAccessTest(TestCase):
+    "Метрики отдаются только по токену или разрешенным адресам."
+    url = reverse('metrics')
+
+    @override_settings(METRICS=False)
+    def test_disabled(self):
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    def test_forbidden_address(self):
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+    @override_settings(METRICS_ALLOWED_IPS=['127.0.0.1'])
+    def test_allowed_address(self):
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    @override_settings(METRICS_TOKEN='secret',
+                       METRICS_ALLOWED_IPS=['127.0.0.1'])
+    def test_token(self):
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+        self.assertEqual(self.client.get(
+            self.url, HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        self.assertEqual(self.client.get(
+            self.url, HTTP_AUTHORIZATION='Bearer secret').status_code, 200)
@@ -0,0 +1,33 @@
+import base64
+import json
+
+from django.test import TestCase
+from django.urls import reverse
+
+
+def cursor(position, reverse=False):
+    return base64.urlsafe_b64encode(
+        json.dumps({'p': position, 'r': reverse}).encode()).decode()
+
+
+class CursorTest(TestCase):
+    "Курсор с неверными значениями дает 404, а не ошибку сервера."
+    url = reverse('foodgram:recipe-list')
+
+    def test_valid_cursor(self):
+        response = self.client.get(self.url, {
+            'cursor': cursor(['2020-01-01T00:00:00+00:00', 1])})
+        self.assertEqual(response.status_code, 200)
+
+    def test_malformed_cursor(self):
+        for value in (
+            'garbage',
+            cursor(['garbage', 1]),
+            cursor(['2020-01-01T00:00:00+00:00', 'x']),
+            cursor([1, 2]),
+            cursor(['2020-01-01T00:00:00+00:00', [1]]),
+            cursor(['2020-01-01T00:00:00+00:00']),
+        ):
+            with self.subTest(cursor=value):
+                response = self.client.get(self.url, {'cursor': value})
+                self.assertEqual(response.status_code, 404)
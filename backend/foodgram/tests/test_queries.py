@@ -0,0 +1,110 @@
+import base64
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from foodgram.catalog import expire_catalogs
+from foodgram.models import (Favorite, Follow, Ingredient, Recipe,
+                             RecipeIngredient, Tag)
+from users.models import CustomUser
+
+MEDIA_ROOT = tempfile.mkdtemp()
+PAGE_SIZES = (1, 20)
+# Запросов на страницу списка при холодном кеше, при любом ее размере.
+BUDGETS = {
+    'recipe_list': 8,
+    'recipe_list_filtered': 9,
+    'subscriptions': 4,
+}
+IMAGE = base64.b64decode(
+    'R0lGODlhAQABAIAAAAAAAP///yH5BAEAAAAALAAAAAABAAEAAAIBRAA7')
+
+
+@override_settings(
+    MEDIA_ROOT=MEDIA_ROOT,
+    RECIPE_IMAGE_ASYNC=False,
+    CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+)
+class ListQueriesTest(TestCase):
+    "Число запросов списков не зависит от размера страницы."
+
+    @classmethod
+    def setUpTestData(cls):
+        users = [
+            CustomUser.objects.create(
+                username=f'user{number}', email=f'user{number}@example.com',
+                first_name='Имя', last_name='Фамилия')
+            for number in range(6)
+        ]
+        cls.user, authors = users[0], users[1:]
+        tags = [
+            Tag.objects.create(name=name, color=color, slug=slug)
+            for name, color, slug in (
+                ('Завтрак', '#A87D32', 'breakfast'),
+                ('Обед', '#32A84A', 'lunch'),
+            )
+        ]
+        ingredients = [
+            Ingredient.objects.create(
+                name=f'Ингредиент {number}', measurement_unit='г')
+            for number in range(6)
+        ]
+        for number in range(25):
+            recipe = Recipe.objects.create(
+                author=authors[number % len(authors)],
+                name=f'Рецепт {number}', text='Описание', cooking_time=10,
+                image=ContentFile(IMAGE, name='recipe.gif'))
+            recipe.tags.set(tags)
+            recipe.ingredients.set([
+                RecipeIngredient.objects.create(
+                    ingredient=ingredient, amount=number + 1)
+                for ingredient in ingredients[number % 3:number % 3 + 3]
+            ])
+            if number % 2:
+                Favorite.objects.create(user=cls.user, recipe=recipe)
+        for author in authors:
+            Follow.objects.create(user=cls.user, author=author)
+        cls.token = Token.objects.create(user=cls.user)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def get(self, url):
+        cache.clear()
+        expire_catalogs()
+        response = self.client.get(
+            url, HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def assertListQueries(self, name, url):
+        for page_size in PAGE_SIZES:
+            with self.subTest(limit=page_size):
+                with self.assertNumQueries(BUDGETS[name]):
+                    response = self.get(f'{url}limit={page_size}')
+                self.assertEqual(
+                    len(response.json()['results']),
+                    min(page_size, response.json()['count']))
+
+    def test_recipe_list(self):
+        self.assertListQueries(
+            'recipe_list', reverse('foodgram:recipe-list') + '?')
+
+    def test_recipe_list_filtered(self):
+        self.assertListQueries(
+            'recipe_list_filtered',
+            reverse('foodgram:recipe-list')
+            + '?is_favorited=1&tags=breakfast&tags=lunch&')
+
+    def test_subscriptions(self):
+        self.assertListQueries(
+            'subscriptions',
+            reverse('foodgram:subscriptions') + '?recipes_limit=3&')
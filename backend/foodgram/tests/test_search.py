@@ -0,0 +1,35 @@
+from django.test import TestCase
+from django.urls import reverse
+
+from foodgram.models import Ingredient, Recipe, RecipeIngredient
+from users.models import CustomUser
+
+
+class RecipeSearchTest(TestCase):
+    "Поиск рецептов не зависит от регистра, в том числе для кириллицы."
+    url = reverse('foodgram:recipe-list')
+
+    @classmethod
+    def setUpTestData(cls):
+        author = CustomUser.objects.create(
+            username='author', email='author@example.com')
+        cls.pie = Recipe.objects.create(
+            author=author, name='Пирог с ВИШНЕЙ', text='Испечь в духовке',
+            image='foodgram/images/pie.png', cooking_time=40)
+        cls.pie.ingredients.set([RecipeIngredient.objects.create(
+            ingredient=Ingredient.objects.create(
+                name='Мука пшеничная', measurement_unit='г'),
+            amount=200)])
+        Recipe.objects.create(
+            author=author, name='Салат', text='Нарезать овощи',
+            image='foodgram/images/salad.png', cooking_time=10)
+
+    def search(self, value):
+        response = self.client.get(self.url, {'search': value})
+        self.assertEqual(response.status_code, 200)
+        return [recipe['id'] for recipe in response.json()['results']]
+
+    def test_case_insensitive(self):
+        for value in ('пирог', 'ВИШНЕЙ', 'вишней', 'ДУХОВКЕ', 'мука'):
+            with self.subTest(value=value):
+                self.assertEqual(self.search(value), [self.pie.id])
@@ -0,0 +1,88 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import connection
+from rest_framework import serializers
+
+current = ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    """Замеры одного запроса: число и время SQL-запросов,
+    время сериализации и рендеринга ответа, в секундах.
+    Время сериализации включает SQL ленивых выборок внутри нее."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.db = 0.0
+        self.serialize = 0.0
+        self.render = 0.0
+        self.render_start = None
+        self.depth = 0
+        self.view = None
+
+    def __call__(self, execute, sql, params, many, context):
+        "Обертка для connection.execute_wrapper."
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db += time.perf_counter() - start
+            self.queries += 1
+
+    def rendering(self, response):
+        self.render_start = time.perf_counter()
+        response.add_post_render_callback(self.rendered)
+
+    def rendered(self, response):
+        self.render += time.perf_counter() - self.render_start
+
+    def total(self):
+        return time.perf_counter() - self.start
+
+
+@contextmanager
+def measure_request():
+    """Замеры текущего запроса. Если запрос уже замеряется внешним
+    middleware, например для метрик, возвращаются те же замеры."""
+    timings = current.get()
+    if timings is not None:
+        yield timings
+        return
+    timings = RequestTimings()
+    token = current.set(timings)
+    try:
+        with connection.execute_wrapper(timings):
+            yield timings
+    finally:
+        current.reset(token)
+
+
+def timed_data(data):
+    "Свойство data сериализатора с замером, считается только внешний вызов."
+
+    def get_data(serializer):
+        timings = current.get()
+        if timings is None or timings.depth:
+            return data.fget(serializer)
+        timings.depth += 1
+        start = time.perf_counter()
+        try:
+            return data.fget(serializer)
+        finally:
+            timings.serialize += time.perf_counter() - start
+            timings.depth -= 1
+
+    get_data.timed = True
+    return property(get_data)
+
+
+def instrument_serializers():
+    """Замер времени в BaseSerializer.data: через super().data
+    его вызывают и Serializer, и ListSerializer, в том числе djoser.
+    Вне замеряемого запроса это одна проверка ContextVar."""
+    data = serializers.BaseSerializer.data
+    if not getattr(data.fget, 'timed', False):
+        serializers.BaseSerializer.data = timed_data(data)
@@ -17,7 +17,9 @@ router_v1.register('users', UserGetPostViewSet, basename='users')
 
 urlpatterns = [
     path('users/subscriptions/',
-         UserGetPostViewSet.as_view({'get': 'subscriptions'}),
+         UserGetPostViewSet.as_view(
+             {'get': 'subscriptions'},
+             **UserGetPostViewSet.subscriptions.kwargs),
          name='subscriptions'),
     path('', include('djoser.urls')),
     path('', include(router_v1.urls)),
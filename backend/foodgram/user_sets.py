@@ -0,0 +1,105 @@
+from array import array
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from . import metrics
+from .models import Favorite, Follow, ShoppingCart
+
+FAVORITES = 'favorites'
+CART = 'cart'
+FOLLOWS = 'follows'
+
+SOURCES = {
+    FAVORITES: (Favorite, 'recipe_id'),
+    CART: (ShoppingCart, 'recipe_id'),
+    FOLLOWS: (Follow, 'author_id'),
+}
+SET_NAMES = {model: name for name, (model, _) in SOURCES.items()}
+
+ARRAY_TYPE = 'q'
+
+
+class IdSet:
+    "Отсортированный массив id с проверкой вхождения двоичным поиском."
+
+    def __init__(self, ids=None):
+        self.ids = ids if ids is not None else array(ARRAY_TYPE)
+
+    @classmethod
+    def from_bytes(cls, data):
+        ids = array(ARRAY_TYPE)
+        ids.frombytes(data)
+        return cls(ids)
+
+    def to_bytes(self):
+        return self.ids.tobytes()
+
+    def __contains__(self, pk):
+        position = bisect_left(self.ids, pk)
+        return position < len(self.ids) and self.ids[position] == pk
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, pk):
+        position = bisect_left(self.ids, pk)
+        if position == len(self.ids) or self.ids[position] != pk:
+            self.ids.insert(position, pk)
+
+    def discard(self, pk):
+        position = bisect_left(self.ids, pk)
+        if position < len(self.ids) and self.ids[position] == pk:
+            del self.ids[position]
+
+
+def user_set_key(name, user_id):
+    return f'user_set:{name}:{user_id}'
+
+
+def load_user_set(name, user_id):
+    "Множество из базы одним запросом по индексу пользователя."
+    model, field = SOURCES[name]
+    return IdSet(array(ARRAY_TYPE, model.objects.filter(
+        user_id=user_id).order_by(field).values_list(field, flat=True)))
+
+
+def get_user_set(user, name):
+    """Id избранных рецептов, рецептов в корзине или авторов в подписках.
+    Берется из кеша, при промахе загружается из базы, и запоминается
+    на объекте пользователя до конца запроса."""
+    if user is None or not user.is_authenticated:
+        return IdSet()
+    sets = user.__dict__.setdefault('user_sets', {})
+    if name not in sets:
+        key = user_set_key(name, user.pk)
+        data = cache.get(key)
+        metrics.cache_lookup('user_sets', data is not None)
+        if data is None:
+            sets[name] = load_user_set(name, user.pk)
+            cache.set(
+                key, sets[name].to_bytes(), settings.USER_SETS_CACHE_TIMEOUT)
+        else:
+            sets[name] = IdSet.from_bytes(data)
+    return sets[name]
+
+
+def update_user_set(name, user, user_id, pks, present):
+    """Изменение множества пользователя: сразу в памяти запроса,
+    а из кеша оно удаляется после фиксации транзакции и загрузится
+    из базы при следующем обращении. Правка закешированных байтов
+    без блокировки теряла бы одно из двух параллельных изменений."""
+    if user is not None:
+        sets = user.__dict__.get('user_sets', {})
+        if name in sets:
+            for pk in pks:
+                if present:
+                    sets[name].add(pk)
+                else:
+                    sets[name].discard(pk)
+    transaction.on_commit(lambda: cache.delete(user_set_key(name, user_id)))
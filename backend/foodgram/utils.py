@@ -1,68 +1,90 @@
-import io
+from collections import defaultdict
 
-from django.http import HttpResponse
-from django.shortcuts import get_object_or_404
+from django.db import transaction
+from django.http import Http404
 from rest_framework import status
 from rest_framework.response import Response
 
-from .models import Follow, Recipe
+from .links import add_link, change_links, remove_link
+from .models import Recipe
+from .user_sets import FOLLOWS, get_user_set
+
+RECIPES_LIMIT_MAX = 100
+
+
+def in_user_set(self, name, pk):
+    "Проверка id по множеству текущего пользователя из контекста."
+    request = self.context.get('request')
+    return pk in get_user_set(getattr(request, 'user', None), name)
 
 
 def is_subscribed(self, obj):
     "Проверка подписки для пользователя."
+    return in_user_set(self, FOLLOWS, obj.id)
+
+
+def get_recipes_limit(request):
+    "Разбор и ограничение параметра recipes_limit."
     try:
-        author = self.context.get('request').user
-        return Follow.objects.filter(
-            author=obj.id, user=author).exists()
-    except TypeError:
-        return False
-
-
-def writing_shopping_cart(shopping_cart):
-    "Создание файла со списком покупок."
-    shopping_list = {}
-    file = io.StringIO()
-    file.write('Список покупок:'.encode('utf-8').decode('utf-8') + '\n')
-    for ingredient in shopping_cart:
-        name = ingredient['ingredients__ingredient__name']
-        measurement_unit = ingredient[
-            'ingredients__ingredient__measurement_unit']
-        amount = ingredient['amount']
-        ingredient_str = f'{name}, {measurement_unit}'
-        shopping_list[ingredient_str] = amount
-    for name, data in shopping_list.items():
-        line = f'{name} - {data}'
-        file.write(line.encode('utf-8').decode('utf-8') + '\n')
-    response = HttpResponse(
-        file.getvalue(), content_type="text/plain", charset="utf-8")
-    response['Content-Disposition'] = 'attachment'
-    return response
+        recipes_limit = int(request.query_params.get('recipes_limit'))
+    except (TypeError, ValueError):
+        return None
+    return min(max(recipes_limit, 0), RECIPES_LIMIT_MAX)
+
+
+def get_recipes_previews(authors, recipes_limit=None):
+    "Превью рецептов для страницы подписок, сгруппированные по авторам."
+    previews = defaultdict(list)
+    recipes = Recipe.objects.filter(
+        author__in=authors).limited_per_author(recipes_limit)
+    for recipe in recipes:
+        previews[recipe.author_id].append(recipe)
+    return previews
 
 
+def get_pk(kwargs):
+    "id из адреса или 404, если это не число."
+    try:
+        return int(kwargs.get('pk'))
+    except (TypeError, ValueError):
+        raise Http404
+
+
+@transaction.atomic
 def add_delete_shopping_cart_favorite(self, request, Model,
                                       Serializer, *args, **kwargs):
-    "Добавление и отбавление списка покупок и избранного."
-    recipe = get_object_or_404(Recipe, id=kwargs.get('pk'))
+    """Добавление и удаление рецепта в избранном и списке покупок.
+    Повторное добавление или удаление не ошибка: ответ тот же,
+    только при добавлении 200 вместо 201."""
+    recipe_id = get_pk(kwargs)
     user = self.request.user
     if request.method == 'POST':
-        if Model.objects.filter(user=user, recipe=recipe).exists():
-            return Response(
-                {'errors': 'Данный рецепт уже тут...'},
-                status=status.HTTP_400_BAD_REQUEST)
-        serializer = Serializer(
-            data=request.data,
-            context={'request': request, 'recipe': recipe},
-        )
-        serializer.is_valid(raise_exception=True)
-        serializer.save(recipe=recipe, user=user)
+        recipe = add_link(Model, user, recipe_id)
+        if recipe is None:
+            raise Http404
         return Response(
-            {'Рецепт успешно добавлен': serializer.data},
-            status=status.HTTP_200_OK)
-    if Model.objects.filter(user=user, recipe=recipe).exists():
-        Model.objects.get(user=user, recipe=recipe).delete()
-        return Response(
-            'Рецепт успешно удален',
-            status=status.HTTP_204_NO_CONTENT)
+            Serializer(recipe, context={'request': request}).data,
+            status=(status.HTTP_201_CREATED if recipe.created
+                    else status.HTTP_200_OK))
+    if not remove_link(Model, user, recipe_id) and not (
+            Recipe.objects.filter(id=recipe_id).exists()):
+        raise Http404
+    return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+@transaction.atomic
+def bulk_shopping_cart_favorite(request, Model, Serializer):
+    """Добавление и удаление списка рецептов в избранном и списке
+    покупок одним запросом к базе. Итог для каждого id: added,
+    already, removed, absent или not_found."""
+    serializer = Serializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    outcomes = change_links(
+        Model, request.user, serializer.validated_data['recipes'],
+        request.method == 'POST')
     return Response(
-        {'errors': 'А рецепта то и не было...'},
-        status=status.HTTP_400_BAD_REQUEST)
+        {'recipes': [
+            {'id': pk, 'status': outcome}
+            for pk, outcome in outcomes.items()
+        ]},
+        status=status.HTTP_200_OK)
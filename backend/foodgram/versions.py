@@ -0,0 +1,93 @@
+import hashlib
+import time
+from datetime import datetime, timezone
+from uuid import uuid4
+
+from django.core.cache import cache
+
+from .models import Recipe
+from .user_sets import CART, FAVORITES, FOLLOWS, get_user_set
+
+
+def catalog_version_key(name):
+    return f'catalog:{name}:version'
+
+
+def get_catalog_version(name):
+    """Версия справочника и время его последнего изменения.
+    Хранится в кеше, общем для всех процессов."""
+    return cache.get_or_set(
+        catalog_version_key(name), (uuid4().hex, time.time()), None)
+
+
+def bump_catalog_version(name):
+    "Новая версия справочника после его изменения."
+    cache.set(catalog_version_key(name), (uuid4().hex, time.time()), None)
+
+
+def catalog_etag(*names):
+    "ETag списка из версий справочников, без сериализации ответа."
+    def etag(request, *args, **kwargs):
+        return '-'.join(get_catalog_version(name)[0] for name in names)
+    return etag
+
+
+def catalog_last_modified(*names):
+    def last_modified(request, *args, **kwargs):
+        return datetime.fromtimestamp(
+            max(get_catalog_version(name)[1] for name in names),
+            tz=timezone.utc)
+    return last_modified
+
+
+AUTHOR_FIELDS = ('username', 'first_name', 'last_name', 'email')
+
+
+def get_recipe_version(request, pk):
+    """Время изменения рецепта, готовность копий изображения,
+    поля автора из ответа и флаги текущего пользователя.
+    Считается одним запросом и запоминается на время запроса."""
+    versions = getattr(request, 'recipe_versions', None)
+    if versions is None:
+        versions = request.recipe_versions = {}
+    if pk not in versions:
+        version = Recipe.objects.filter(pk=pk).values_list(
+            'id', 'updated_at', 'author_id', 'image_resized',
+            *(f'author__{field}' for field in AUTHOR_FIELDS)).first()
+        if version is not None:
+            recipe_id, updated_at, author_id, image_resized, *author = version
+            version = (
+                updated_at,
+                author,
+                image_resized,
+                recipe_id in get_user_set(request.user, FAVORITES),
+                recipe_id in get_user_set(request.user, CART),
+                author_id in get_user_set(request.user, FOLLOWS),
+            )
+        versions[pk] = version
+    return versions[pk]
+
+
+def recipe_etag(request, pk=None, *args, **kwargs):
+    version = get_recipe_version(request, pk)
+    if version is None:
+        return None
+    updated_at, author, *flags = version
+    key = ':'.join(
+        [str(pk), updated_at.isoformat()]
+        + author
+        + [str(int(flag)) for flag in flags]
+        + [get_catalog_version(name)[0] for name in ('tag', 'ingredient')]
+    )
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+def recipe_last_modified(request, pk=None, *args, **kwargs):
+    """Дата изменения рецепта только для анонимных пользователей:
+    флаги пользователя меняются без изменения рецепта."""
+    if request.user.is_authenticated:
+        return None
+    version = get_recipe_version(request, pk)
+    if version is None:
+        return None
+    return version[0]
@@ -1,28 +1,43 @@
-from django.db.models import Sum
-from django_filters.rest_framework import DjangoFilterBackend
-from django.shortcuts import get_object_or_404
-from rest_framework import permissions, status, viewsets, filters
+from django.conf import settings
+from django.db.models import Count
+from django.http import Http404
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+from django.views.decorators.vary import vary_on_headers
+from rest_framework import permissions, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
 
-from .filters import RecipeFilter, IngredientFilter
+from . import catalog
+from .exporters import (SHOPPING_LIST_FORMATS, ShoppingListNegotiation,
+                        shopping_cart_response)
+from .filters import RecipeFilter
 from .models import (Ingredient, Favorite, Follow, Recipe,
                      RecipeIngredient, ShoppingCart, Tag)
-from .pagination import PageLimitPagination
+from .pagination import (FeedPagination, FollowFeedPagination,
+                         PageLimitPagination)
 from .permissions import IsAdminOrReadOnly
-from .serializers import (FavoriteSerializer,
-                          FollowSerializer,
+from .search import search_ingredients
+from .links import add_link, remove_link
+from .serializers import (FollowSerializer,
                           IngredientSerializer,
+                          RecipeFollowSerializer,
+                          RecipeIdsSerializer,
                           RecipeIngredientSerializer,
                           RecipeGETSerializer,
                           RecipePOSTSerializer,
-                          ShoppingCartSerializer,
                           TagSerializer,
                           UserSerializer,
                           UserGETSerializer,
                           )
-from .utils import (writing_shopping_cart,
+from .user_sets import FOLLOWS, get_user_set
+from .utils import (bulk_shopping_cart_favorite,
+                    get_pk,
+                    get_recipes_limit,
+                    get_recipes_previews,
                     add_delete_shopping_cart_favorite)
+from .versions import (catalog_etag, catalog_last_modified, recipe_etag,
+                       recipe_last_modified)
 from users.models import CustomUser
 
 
@@ -36,15 +51,22 @@ class UserGetPostViewSet(viewsets.ModelViewSet):
     @action(
         methods=['GET'],
         detail=False,
-        permission_classes=(permissions.IsAuthenticated,)
+        permission_classes=(permissions.IsAuthenticated,),
+        pagination_class=FollowFeedPagination
     )
     def subscriptions(self, request):
-        queryset = Follow.objects.filter(user=self.request.user)
+        queryset = Follow.objects.filter(
+            user=self.request.user).select_related('author').annotate(
+                recipes_count=Count('author__recipe')).order_by('-id')
         pages = self.paginate_queryset(queryset)
+        recipes_previews = get_recipes_previews(
+            [follow.author_id for follow in pages],
+            get_recipes_limit(request))
         serializer = FollowSerializer(
             pages,
             many=True,
-            context={'request': request},
+            context={'request': request,
+                     'recipes_previews': recipes_previews},
         )
         return self.get_paginated_response(serializer.data)
 
@@ -54,33 +76,27 @@ class UserGetPostViewSet(viewsets.ModelViewSet):
         permission_classes=(permissions.IsAuthenticated,)
     )
     def subscribe(self, request, *args, **kwargs):
-        author = get_object_or_404(CustomUser, id=kwargs.get('pk'))
+        author_id = get_pk(kwargs)
         user = self.request.user
         if request.method == "POST":
-            if author == user:
+            if author_id == user.id:
                 return Response(
                     {'errors': 'Нет смысла подписываться на самого себя'},
                     status=status.HTTP_400_BAD_REQUEST)
-            if Follow.objects.filter(user=user, author=author).exists():
-                return Response(
-                    {'errors': 'Вы уже подписаны на данного пользователя'},
-                    status=status.HTTP_400_BAD_REQUEST)
-            serializer = FollowSerializer(
-                data=request.data,
-                context={'request': request, 'author': author},
-            )
-            serializer.is_valid(raise_exception=True)
-            Follow.objects.create(author=author, user=user)
-            serializer = self.get_serializer(author)
+            # Множество подписок загружается до вставки, чтобы
+            # is_subscribed в ответе уже учитывал новую подписку.
+            get_user_set(user, FOLLOWS)
+            author = add_link(Follow, user, author_id)
+            if author is None:
+                raise Http404
             return Response(
-                serializer.data,
-                status=status.HTTP_200_OK)
-        if Follow.objects.filter(user=user, author=author).exists():
-            Follow.objects.get(user=user, author=author).delete()
-            return Response(status=status.HTTP_204_NO_CONTENT)
-        return Response(
-            {'errors': 'А подписки то и не было...'},
-            status=status.HTTP_400_BAD_REQUEST)
+                UserGETSerializer(author, context={'request': request}).data,
+                status=(status.HTTP_201_CREATED if author.created
+                        else status.HTTP_200_OK))
+        if not remove_link(Follow, user, author_id) and not (
+                CustomUser.objects.filter(id=author_id).exists()):
+            raise Http404
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
     def get_serializer_class(self):
         if self.request.method == 'GET':
@@ -93,9 +109,25 @@ class IngredientViewSet(viewsets.ModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = (IsAdminOrReadOnly,)
-    filter_backends = (DjangoFilterBackend, filters.SearchFilter)
     pagination_class = None
-    filterset_class = IngredientFilter
+
+    @method_decorator(condition(
+        etag_func=catalog_etag('ingredient'),
+        last_modified_func=catalog_last_modified('ingredient')))
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+    @method_decorator(condition(
+        etag_func=catalog_etag('ingredient'),
+        last_modified_func=catalog_last_modified('ingredient')))
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get('name', '')
+        try:
+            limit = min(max(int(request.query_params.get('limit')), 1),
+                        settings.INGREDIENT_SEARCH_LIMIT)
+        except (TypeError, ValueError):
+            limit = settings.INGREDIENT_SEARCH_LIMIT if name else None
+        return Response(search_ingredients(name, limit))
 
 
 class RecipeIngredientViewSet(viewsets.ModelViewSet):
@@ -112,12 +144,25 @@ class TagViewSet(viewsets.ModelViewSet):
     permission_classes = (IsAdminOrReadOnly,)
     pagination_class = None
 
+    @method_decorator(condition(
+        etag_func=catalog_etag('tag'),
+        last_modified_func=catalog_last_modified('tag')))
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+    @method_decorator(condition(
+        etag_func=catalog_etag('tag'),
+        last_modified_func=catalog_last_modified('tag')))
+    def list(self, request, *args, **kwargs):
+        return Response(
+            self.get_serializer(catalog.tags.all(), many=True).data)
+
 
 class RecipeViewSet(viewsets.ModelViewSet):
     """Вьюсет для объектов класса Recipe."""
     queryset = Recipe.objects.all()
     filterset_class = RecipeFilter
-    pagination_class = PageLimitPagination
+    pagination_class = FeedPagination
     permission_classes = (permissions.AllowAny,)
 
     def get_serializer_class(self):
@@ -125,6 +170,15 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return RecipeGETSerializer
         return RecipePOSTSerializer
 
+    def get_queryset(self):
+        return Recipe.objects.with_related()
+
+    @method_decorator(vary_on_headers('Authorization'))
+    @method_decorator(condition(
+        etag_func=recipe_etag, last_modified_func=recipe_last_modified))
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
     def perform_create(self, serializer):
         serializer.save(
             author=self.request.user
@@ -134,20 +188,22 @@ class RecipeViewSet(viewsets.ModelViewSet):
     @action(
         methods=['GET'],
         detail=False,
-        permission_classes=(permissions.AllowAny,)
+        permission_classes=(permissions.IsAuthenticated,),
+        content_negotiation_class=ShoppingListNegotiation
     )
     def download_shopping_cart(self, request, *args, **kwargs):
-        user = self.request.user
-        if ShoppingCart.objects.filter(user=user).exists():
-            shopping_cart = Recipe.objects.filter(
-                shoping__user=user).values(
-                    'ingredients__ingredient__name',
-                    'ingredients__ingredient__measurement_unit').annotate(
-                        amount=Sum('ingredients__amount'),)
-            return writing_shopping_cart(shopping_cart)
-        return Response(
-            {'errors': 'Список покупок пуст'},
-            status=status.HTTP_400_BAD_REQUEST)
+        export_format = request.query_params.get('format', 'txt')
+        if export_format not in SHOPPING_LIST_FORMATS:
+            return Response(
+                {'errors': 'Доступные форматы: '
+                 + ', '.join(SHOPPING_LIST_FORMATS)},
+                status=status.HTTP_400_BAD_REQUEST)
+        response = shopping_cart_response(self.request.user, export_format)
+        if response is None:
+            return Response(
+                {'errors': 'Список покупок пуст'},
+                status=status.HTTP_400_BAD_REQUEST)
+        return response
 
     @action(
         methods=['POST', 'DELETE'],
@@ -156,7 +212,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
     )
     def favorite(self, request, *args, **kwargs):
         response = add_delete_shopping_cart_favorite(
-            self, request, Favorite, FavoriteSerializer, *args, **kwargs)
+            self, request, Favorite, RecipeFollowSerializer, *args, **kwargs)
         return response
 
     @action(
@@ -167,5 +223,27 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def shopping_cart(self, request, *args, **kwargs):
         response = add_delete_shopping_cart_favorite(
             self, request, ShoppingCart,
-            ShoppingCartSerializer, *args, **kwargs)
+            RecipeFollowSerializer, *args, **kwargs)
         return response
+
+    @action(
+        methods=['POST', 'DELETE'],
+        detail=False,
+        url_path='favorite',
+        url_name='favorite-bulk',
+        permission_classes=(permissions.IsAuthenticated,)
+    )
+    def favorite_bulk(self, request, *args, **kwargs):
+        return bulk_shopping_cart_favorite(
+            request, Favorite, RecipeIdsSerializer)
+
+    @action(
+        methods=['POST', 'DELETE'],
+        detail=False,
+        url_path='shopping_cart',
+        url_name='shopping-cart-bulk',
+        permission_classes=(permissions.IsAuthenticated,)
+    )
+    def shopping_cart_bulk(self, request, *args, **kwargs):
+        return bulk_shopping_cart_favorite(
+            request, ShoppingCart, RecipeIdsSerializer)
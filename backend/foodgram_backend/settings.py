@@ -14,7 +14,7 @@ DEBUG = False
 
 ALLOWED_HOSTS = [
     '127.0.0.1', 'localhost', '192.168.56.102', '192.168.0.105',
-    '0.0.0.0', '84.252.138.51', 'slavas-practicum.ddns.net']
+    '0.0.0.0', '84.252.138.51', 'slavas-practicum.ddns.net', 'backend']
 
 INSTALLED_APPS = [
     'django.contrib.admin',
@@ -36,12 +36,16 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'foodgram.middleware.MetricsMiddleware',
+    'foodgram.middleware.ServerTimingMiddleware',
+    'foodgram.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'foodgram.middleware.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'foodgram_backend.urls'
@@ -108,6 +112,78 @@ MEDIA_ROOT = BASE_DIR / 'media'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', '/tmp/foodgram_cache'),
+    }
+}
+
+SHOPPING_CART_CACHE_TIMEOUT = 60 * 60 * 24
+
+INGREDIENT_SEARCH_LIMIT = 50
+
+USER_SETS_CACHE_TIMEOUT = 60 * 60
+
+# Сколько секунд справочник в памяти не сверяет свою версию с общим кешем.
+CATALOG_VERSION_TTL = 1
+
+RECIPE_BULK_MAX = 100
+
+SERVER_TIMING = os.getenv('SERVER_TIMING', 'False') == 'True'
+
+METRICS = os.getenv('METRICS', 'False') == 'True'
+# Без токена /metrics отдается только адресам из METRICS_ALLOWED_IPS.
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+METRICS_ALLOWED_IPS = os.getenv('METRICS_ALLOWED_IPS', '127.0.0.1').split()
+
+PROFILE_DIR = os.getenv('PROFILE_DIR', '/tmp/foodgram_profiles')
+PROFILE_KEEP = 200
+PROFILE_SAMPLE_RATE = int(os.getenv('PROFILE_SAMPLE_RATE', 0))
+# cprofile - pstats, sampling - статистический профиль для speedscope.
+PROFILE_MODE = os.getenv('PROFILE_MODE', 'cprofile')
+PROFILE_SAMPLING_INTERVAL = 0.001
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'foodgram': {
+            'handlers': ['console'],
+            'level': os.getenv('FOODGRAM_LOG_LEVEL', 'INFO'),
+        },
+    },
+}
+
+COMPRESSION_MIN_SIZE = 1024
+BROTLI_QUALITY = 4
+
+RECIPE_IMAGE_WIDTHS = {
+    'card': 480,
+    'detail': 1200,
+}
+RECIPE_IMAGE_TYPES = {
+    'image/jpeg': 'JPEG',
+    'image/jpg': 'JPEG',
+    'image/png': 'PNG',
+    'image/gif': 'GIF',
+    'image/webp': 'WEBP',
+}
+RECIPE_IMAGE_MAX_SIZE = 10 * 1024 * 1024
+RECIPE_IMAGE_MAX_PIXELS = 40 * 1000 * 1000
+RECIPE_IMAGE_DECODE_CHUNK = 64 * 1024
+# Изображение приходит в JSON в base64, то есть на треть больше.
+DATA_UPLOAD_MAX_MEMORY_SIZE = RECIPE_IMAGE_MAX_SIZE * 4 // 3 + 1024 * 1024
+RECIPE_IMAGE_ASYNC = True
+RECIPE_IMAGE_WORKERS = 2
+
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
@@ -118,6 +194,10 @@ REST_FRAMEWORK = {
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'foodgram.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'foodgram.pagination.PageLimitPagination',
     'PAGE_SIZE': 6,
 }
@@ -133,6 +213,7 @@ DJOSER = {
     "LOGIN_FIELD": 'email',
     'USER_ID_FIELD': 'id',
     'PASSWORD_RESET_CONFIRM_URL': 'set_password/{uid}/{token}',
+    'USERNAME_RESET_CONFIRM_URL': 'set_email/{uid}/{token}',
     "SEND_ACTIVATION_EMAIL": False,
     'HIDE_USERS': False,
     'SERIALIZERS': {
@@ -1,8 +1,10 @@
 from django.contrib import admin
 from django.urls import path, include
 
+from foodgram.metrics import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('api/', include('foodgram.urls'))
+    path('api/', include('foodgram.urls')),
+    path('metrics', metrics_view, name='metrics'),
 ]
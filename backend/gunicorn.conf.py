@@ -0,0 +1,18 @@
+import os
+import shutil
+
+# Метрики воркеров складываются в файлы этого каталога, /metrics любого
+# воркера отдает их сумму. Каталог задается до импорта prometheus_client.
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/prometheus')
+
+
+def on_starting(server):
+    "Метрики прошлого запуска не должны попасть в новые."
+    directory = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)